@@ -1,22 +1,233 @@
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, Request
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, Request, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response, ORJSONResponse
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import os
+import asyncio
+import time
 import motor.motor_asyncio
+import orjson
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne, ReturnDocument
+from pymongo.errors import OperationFailure, DuplicateKeyError, BulkWriteError
+from pymongo import monitoring
 import bcrypt
 import jwt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone, date, time as dt_time
+from zoneinfo import ZoneInfo
+import bisect
+import math
+import sqlite3
+import threading
 import uuid
+import random
+import base64
+import json
+import csv
+import io
+import zlib
+import hashlib
+import re
+import unicodedata
+import fcntl
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote, urlencode
+from collections import OrderedDict, deque
 from enum import Enum
 import aiofiles
 import mimetypes
 
+# Metrics (Prometheus text format, served at /metrics). Instruments are
+# updated from the event loop and from PyMongo/executor threads, so each one
+# guards its state with a lock.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self.labels, key, value) for key, value in self._values.items()]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class CollectedCounter(Counter):
+    """Counter mirrored from a component's own running total at scrape time."""
+
+    def set(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            snapshot = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        samples = []
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                samples.append((f"{self.name}_bucket", self.labels + ("le",), key + (le,), cumulative))
+            samples.append((f"{self.name}_sum", self.labels, key, total))
+            samples.append((f"{self.name}_count", self.labels, key, count))
+        return samples
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+        # Callbacks that refresh gauges from other components before a scrape
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, label_names, label_values, value in metric.samples():
+                lines.append(f"{name}{format_labels(label_names, label_values)} {value}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+HTTP_REQUESTS = metrics.register(Counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status")
+))
+HTTP_LATENCY = metrics.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+))
+HTTP_IN_FLIGHT = metrics.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled"
+))
+MONGO_LATENCY = metrics.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ("command",)
+))
+MONGO_FAILURES = metrics.register(Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands", ("command",)
+))
+UPLOAD_BYTES = metrics.register(Counter(
+    "upload_bytes_total", "Bytes received in case document uploads", ("source",)
+))
+AUTH_LATENCY = metrics.register(Histogram(
+    "auth_duration_seconds", "Bearer token decoding and principal resolution latency"
+))
+JOB_RUNS = metrics.register(Counter(
+    "jobs_total", "Background job attempts", ("kind", "result")
+))
+JOB_LATENCY = metrics.register(Histogram(
+    "job_duration_seconds", "Background job run time", ("kind",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+))
+RESPONSE_CACHE_REQUESTS = metrics.register(Counter(
+    "response_cache_requests_total", "Per-user response cache lookups", ("route", "result")
+))
+BCRYPT_LATENCY = metrics.register(Histogram(
+    "bcrypt_duration_seconds", "Password hashing/verification latency including pool wait", ("operation",)
+))
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name)
+        MONGO_FAILURES.inc(command=event.command_name)
+
+class MetricsMiddleware:
+    # Plain ASGI middleware so streaming responses are timed to the last byte
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        status = {"code": 500}
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+        
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # Route templates keep label cardinality bounded
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            HTTP_REQUESTS.inc(method=scope["method"], route=route_path, status=status["code"])
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=scope["method"], route=route_path)
+
 # MongoDB setup
 MONGO_URL = os.environ.get('MONGO_URL')
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL)
+client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL, event_listeners=[MongoCommandMetrics()])
 db = client.law_firm_db
 
 # Collections
@@ -24,14 +235,256 @@ users_collection = db.users
 cases_collection = db.cases
 appointments_collection = db.appointments
 videos_collection = db.videos
+blobs_collection = db.blobs
+upload_sessions_collection = db.upload_sessions
+stats_collection = db.stats_rollups
+appointment_slots_collection = db.appointment_slots
+jobs_collection = db.jobs
+
+# Indexes applied on startup, keyed by collection name
+INDEX_REGISTRY = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "cases": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_id_created_at"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status"),
+        IndexModel([("case_type", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="case_type"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at"),
+        IndexModel([("search_terms", ASCENDING), ("status", ASCENDING)], name="search_terms_status"),
+    ],
+    "appointments": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_id_created_at"),
+        IndexModel([("appointment_date", ASCENDING), ("status", ASCENDING)], name="appointment_date_status"),
+        IndexModel([("user_id", ASCENDING), ("appointment_date", ASCENDING)], name="user_id_appointment_date"),
+    ],
+    "appointment_slots": [
+        IndexModel([("start", ASCENDING)], name="start_unique", unique=True),
+    ],
+    "blobs": [
+        IndexModel([("sha256", ASCENDING)], name="sha256_unique", unique=True),
+        IndexModel([("refcount", ASCENDING), ("updated_at", ASCENDING)], name="refcount_updated_at"),
+    ],
+    "upload_sessions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at"),
+    ],
+    "jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("run_at", ASCENDING)], name="status_run_at"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created_at"),
+    ],
+    "stats_rollups": [
+        IndexModel([("kind", ASCENDING), ("month", DESCENDING)], name="kind_month"),
+    ],
+    "videos": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("category", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="category"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at"),
+    ],
+}
+
+async def ensure_indexes():
+    # create_indexes is a no-op for indexes that already exist with the same spec
+    for collection_name, indexes in INDEX_REGISTRY.items():
+        try:
+            await db[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            print(f"Failed to create indexes on {collection_name}: {e}")
+
+# Read projections; list endpoints return these documents as-is
+CASE_FIELDS = {
+    "_id": 0, "id": 1, "case_type": 1, "title": 1, "description": 1,
+    "status": 1, "files": 1, "created_at": 1, "updated_at": 1
+}
+ADMIN_CASE_FIELDS = {**CASE_FIELDS, "user_id": 1}
+APPOINTMENT_FIELDS = {
+    "_id": 0, "id": 1, "appointment_date": 1, "status": 1, "payment_status": 1,
+    "amount": 1, "notes": 1, "created_at": 1
+}
+VIDEO_FIELDS = {
+    "_id": 0, "id": 1, "title": 1, "description": 1, "video_url": 1, "thumbnail_url": 1,
+    "category": 1, "duration": 1, "views": 1, "created_at": 1
+}
+
+# Pagination settings
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+
+# Export settings
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+# Upload settings
+UPLOAD_DIR = os.environ.get('UPLOAD_DIR', '/app/uploads')
+UPLOAD_CHUNK_BYTES = int(os.environ.get('UPLOAD_CHUNK_BYTES', 1024 * 1024))
+MAX_UPLOAD_FILE_BYTES = int(os.environ.get('MAX_UPLOAD_FILE_BYTES', 25 * 1024 * 1024))
+MAX_UPLOAD_REQUEST_BYTES = int(os.environ.get('MAX_UPLOAD_REQUEST_BYTES', 100 * 1024 * 1024))
+UPLOAD_WRITE_CONCURRENCY = int(os.environ.get('UPLOAD_WRITE_CONCURRENCY', 4))
+# Room for form fields, part headers and boundaries on top of the file bytes
+MULTIPART_OVERHEAD_BYTES = int(os.environ.get('MULTIPART_OVERHEAD_BYTES', 1024 * 1024))
+
+# Content-addressed blob store settings; blobs live under
+# <UPLOAD_DIR>/blobs/<sha[0:2]>/<sha[2:4]>/<sha>
+BLOB_DIR = os.path.join(UPLOAD_DIR, 'blobs')
+UPLOAD_TMP_DIR = os.path.join(UPLOAD_DIR, 'tmp')
+BLOB_GC_INTERVAL_SECONDS = float(os.environ.get('BLOB_GC_INTERVAL_SECONDS', 3600))
+BLOB_GC_GRACE_SECONDS = float(os.environ.get('BLOB_GC_GRACE_SECONDS', 3600))
+
+# Resumable (tus-style) upload settings; partial data lives in
+# <UPLOAD_DIR>/sessions/<upload id> until the upload is finalized
+UPLOAD_SESSION_DIR = os.path.join(UPLOAD_DIR, 'sessions')
+MAX_RESUMABLE_UPLOAD_BYTES = int(os.environ.get('MAX_RESUMABLE_UPLOAD_BYTES', 500 * 1024 * 1024))
+UPLOAD_SESSION_EXPIRY_HOURS = float(os.environ.get('UPLOAD_SESSION_EXPIRY_HOURS', 24))
+TUS_VERSION = "1.0.0"
+
+# File downloads; when FILE_ACCEL_REDIRECT_PREFIX is set (e.g. "/protected-uploads/"
+# mapped to UPLOAD_DIR as an nginx internal location) the body is handed off
+# to the proxy, otherwise it is sent with ASGI zero-copy when the server
+# supports it and in DOWNLOAD_CHUNK_BYTES reads when it does not
+FILE_ACCEL_REDIRECT_PREFIX = os.environ.get('FILE_ACCEL_REDIRECT_PREFIX')
+DOWNLOAD_CHUNK_BYTES = 256 * 1024
+
+# Video view counting; views are buffered per worker, journaled to
+# VIEW_JOURNAL_DIR and applied with one bulk_write per flush interval
+VIEW_FLUSH_INTERVAL_SECONDS = float(os.environ.get('VIEW_FLUSH_INTERVAL_SECONDS', 5))
+VIEW_JOURNAL_DIR = os.environ.get('VIEW_JOURNAL_DIR', '/app/journal/views')
+
+# Video catalogue cache
+VIDEO_CATALOGUE_TTL_SECONDS = float(os.environ.get('VIDEO_CATALOGUE_TTL_SECONDS', 300))
+VIDEO_CATALOGUE_MAX_PAGES = 256
+
+# Case search settings
+SEARCH_CANDIDATE_LIMIT = 1000
+SEARCH_TITLE_WEIGHT = 3.0
+
+# Appointment availability. Appointment times are office wall-clock times
+# (what the booking form sends); aware datetimes are converted to OFFICE_TIMEZONE
+OFFICE_TIMEZONE = ZoneInfo(os.environ.get('OFFICE_TIMEZONE', 'Asia/Beirut'))
+OFFICE_DAYS = {int(d) for d in os.environ.get('OFFICE_DAYS', '0,1,2,3,4').split(',')}  # Monday is 0
+OFFICE_OPEN = dt_time.fromisoformat(os.environ.get('OFFICE_OPEN', '09:00'))
+OFFICE_CLOSE = dt_time.fromisoformat(os.environ.get('OFFICE_CLOSE', '17:00'))
+APPOINTMENT_SLOT_MINUTES = int(os.environ.get('APPOINTMENT_SLOT_MINUTES', 60))
+# A claim whose appointment was never inserted is abandoned after this long
+APPOINTMENT_SLOT_CLAIM_GRACE_SECONDS = int(os.environ.get('APPOINTMENT_SLOT_CLAIM_GRACE_SECONDS', 60))
+AVAILABILITY_MAX_DAYS = 62
+
+# Bulk case status updates
+MAX_BULK_STATUS_UPDATES = 1000
+
+# Client dashboard section limits (default, maximum)
+DASHBOARD_CASES_LIMIT = (5, 50)
+DASHBOARD_APPOINTMENTS_LIMIT = (5, 50)
+DASHBOARD_VIDEOS_LIMIT = (4, 20)
+
+# Background jobs: a Mongo-backed queue worked by JOB_WORKERS tasks per
+# process; CPU-heavy steps run in a pool of JOB_PROCESS_WORKERS processes
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_PROCESS_WORKERS = int(os.environ.get('JOB_PROCESS_WORKERS', 1))
+JOB_POLL_INTERVAL_SECONDS = float(os.environ.get('JOB_POLL_INTERVAL_SECONDS', 5))
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', 300))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get('JOB_RETRY_BASE_SECONDS', 10))
+JOB_RETRY_MAX_SECONDS = 3600
+JOB_WORKER_ID = f"{os.uname().nodename}-{os.getpid()}"
+
+# Post-upload file processing
+FILE_PROCESSING_MAX_BYTES = int(os.environ.get('FILE_PROCESSING_MAX_BYTES', 50 * 1024 * 1024))
+FILE_TEXT_MAX_CHARS = 200_000
+FILE_SEARCH_TERMS_LIMIT = 2000
+
+# Case status events (SSE). "local" publishes from this worker's status
+# handlers; "changestream" follows a MongoDB change stream (replica set
+# required) so subscribers on every worker see every change
+CASE_EVENTS_SOURCE = os.environ.get('CASE_EVENTS_SOURCE', 'local')  # "local" or "changestream"
+CASE_EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('CASE_EVENTS_HEARTBEAT_SECONDS', 15))
+CASE_EVENTS_BUFFER = int(os.environ.get('CASE_EVENTS_BUFFER', 32))  # queued events per subscriber
+CASE_EVENTS_HISTORY = int(os.environ.get('CASE_EVENTS_HISTORY', 1000))  # kept for Last-Event-ID resume
+CASE_EVENTS_RETRY_MS = 3000
 
 # JWT settings
 SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Signed-claims tokens carry id/role/name/token version so requests can be
+# authenticated from the principal cache instead of a users lookup
+AUTH_SIGNED_CLAIMS = os.environ.get('AUTH_SIGNED_CLAIMS', 'true').lower() == 'true'
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', 60))
+
+# Auth rate limiting: token buckets per client IP and per email, checked
+# before any bcrypt work. "sqlite" shares counters between workers on a host.
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # "memory" or "sqlite"
+RATE_LIMIT_SQLITE_PATH = os.environ.get('RATE_LIMIT_SQLITE_PATH', '/app/journal/rate_limits.sqlite3')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+RATE_LIMIT_TRUST_PROXY = os.environ.get('RATE_LIMIT_TRUST_PROXY', 'false').lower() == 'true'
+# (burst capacity, seconds to refill the whole bucket)
+AUTH_RATE_LIMIT_PER_IP = (int(os.environ.get('AUTH_RATE_LIMIT_PER_IP', 20)), 60.0)
+AUTH_RATE_LIMIT_PER_EMAIL = (int(os.environ.get('AUTH_RATE_LIMIT_PER_EMAIL', 5)), 300.0)
+
+# Per-user response cache for the client read endpoints. "sqlite" shares
+# entries (and so invalidations) between workers on a host; with "memory"
+# each worker invalidates only its own copy, so the TTL bounds staleness.
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')  # "memory", "sqlite" or "off"
+RESPONSE_CACHE_SQLITE_PATH = os.environ.get('RESPONSE_CACHE_SQLITE_PATH', '/app/journal/response_cache.sqlite3')
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', 300))
+
+# Password hashing pool settings
+PASSWORD_POOL_KIND = os.environ.get('PASSWORD_POOL_KIND', 'thread')  # "thread" or "process"
+PASSWORD_POOL_WORKERS = int(os.environ.get('PASSWORD_POOL_WORKERS', os.cpu_count() or 2))
+PASSWORD_POOL_MAX_QUEUE = int(os.environ.get('PASSWORD_POOL_MAX_QUEUE', 64))
+
 # Initialize FastAPI
-app = FastAPI(title="Union Law Firm API", description="API for Union Law Firm Platform")
+app = FastAPI(
+    title="Union Law Firm API",
+    description="API for Union Law Firm Platform",
+    default_response_class=ORJSONResponse
+)
+
+class UploadLimitMiddleware:
+    # Starlette parses the whole multipart body into temporary files before
+    # the endpoint runs, so the request limit has to hold while the body is
+    # received: declared lengths are rejected up front and undeclared
+    # (chunked) bodies are cut off once they pass the limit
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not is_multipart(scope):
+            await self.app(scope, receive, send)
+            return
+        
+        limit = MAX_UPLOAD_REQUEST_BYTES + MULTIPART_OVERHEAD_BYTES
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = ORJSONResponse({"detail": "Total upload size is too large"}, status_code=413)
+            await response(scope, receive, send)
+            return
+        
+        received = {"bytes": 0}
+        
+        async def receive_limited():
+            message = await receive()
+            if message["type"] == "http.request":
+                received["bytes"] += len(message.get("body", b""))
+                if received["bytes"] > limit:
+                    # FastAPI passes HTTPExceptions from body parsing through
+                    raise HTTPException(status_code=413, detail="Total upload size is too large")
+            return message
+        
+        await self.app(scope, receive_limited, send)
+
+def is_multipart(scope) -> bool:
+    content_type = dict(scope["headers"]).get(b"content-type", b"")
+    return content_type.lower().startswith(b"multipart/form-data")
+
+# Upload limits sit inside CORS so browsers can read the 413
+app.add_middleware(UploadLimitMiddleware)
 
 # CORS setup
 app.add_middleware(
@@ -40,20 +493,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Location", "Tus-Resumable", "Upload-Offset", "Upload-Length", "Upload-Expires"],
 )
 
+# Metrics wrap everything else so they see the full request time
+app.add_middleware(MetricsMiddleware)
+
 # Security
 security = HTTPBearer()
 
+# Long-running tasks started on startup and cancelled on shutdown
+background_tasks = []
+
 @app.on_event("startup")
 async def startup_event():
+    await ensure_indexes()
+    
     # Create admin user if it doesn't exist
     admin_email = "admin@unionlaw.com"
-    admin_user = await users_collection.find_one({"email": admin_email})
+    admin_user = await users_collection.find_one({"email": admin_email}, {"_id": 1})
     
     if not admin_user:
         admin_id = str(uuid.uuid4())
-        admin_password = hash_password("admin123")
+        admin_password = await hash_password_async("admin123")
         
         admin_data = {
             "id": admin_id,
@@ -62,11 +524,40 @@ async def startup_event():
             "name": "Admin User",
             "role": UserRole.ADMIN,
             "phone": "+961-70-000000",
+            "token_version": 0,
             "created_at": datetime.utcnow()
         }
         
         await users_collection.insert_one(admin_data)
         print(f"Admin user created: {admin_email} / password: admin123")
+    
+    view_counter.open()
+    await view_counter.replay_orphans()
+    
+    # Cases created before search was added get their terms in the background
+    background_tasks.append(asyncio.create_task(backfill_search_terms()))
+    
+    background_tasks.append(asyncio.create_task(blob_gc_loop()))
+    background_tasks.append(asyncio.create_task(view_flush_loop()))
+    background_tasks.append(asyncio.create_task(case_events_heartbeat_loop()))
+    if CASE_EVENTS_SOURCE == "changestream":
+        background_tasks.append(asyncio.create_task(case_events_change_stream_loop()))
+    for _ in range(JOB_WORKERS):
+        background_tasks.append(asyncio.create_task(job_worker_loop()))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    
+    try:
+        await view_counter.flush()
+    finally:
+        view_counter.close()
+    password_pool.shutdown()
+    job_process_pool.shutdown()
 
 # Models
 class UserRole(str, Enum):
@@ -105,6 +596,15 @@ class CaseType(str, Enum):
     ALIMONY = "alimony"
     OTHER = "other"
 
+class CaseFile(BaseModel):
+    name: str
+    original_name: Optional[str] = None
+    content_type: Optional[str] = None
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+    uploaded_at: Optional[datetime] = None
+    processing: Optional[dict] = None
+
 class Case(BaseModel):
     id: str
     user_id: str
@@ -112,7 +612,7 @@ class Case(BaseModel):
     title: str
     description: str
     status: CaseStatus
-    files: List[str]
+    files: List[CaseFile]
     created_at: datetime
     updated_at: datetime
 
@@ -121,6 +621,22 @@ class CaseCreate(BaseModel):
     title: str
     description: str
 
+class CaseStatusChange(BaseModel):
+    case_id: str
+    status: CaseStatus
+
+class CaseStatusFilter(BaseModel):
+    status: Optional[CaseStatus] = None
+    case_type: Optional[CaseType] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+class BulkCaseStatusUpdate(BaseModel):
+    # Either explicit updates, or a filter plus the status to move matches to
+    updates: List[CaseStatusChange] = []
+    filter: Optional[CaseStatusFilter] = None
+    status: Optional[CaseStatus] = None
+
 class AppointmentStatus(str, Enum):
     PENDING = "pending"
     CONFIRMED = "confirmed"
@@ -141,6 +657,35 @@ class AppointmentCreate(BaseModel):
     appointment_date: datetime
     notes: Optional[str] = None
 
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class FileProcessingStatus(str, Enum):
+    QUEUED = "queued"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
+class SortOrder(str, Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+class DashboardAppointments(str, Enum):
+    UPCOMING = "upcoming"
+    ALL = "all"
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class UploadSessionStatus(str, Enum):
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    ATTACHED = "attached"
+
 class Video(BaseModel):
     id: str
     title: str
@@ -159,6 +704,101 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
 
+class PasswordPool:
+    """Runs bcrypt work in an executor so it never blocks the event loop.
+
+    At most ``workers`` jobs run at once and at most ``max_queue`` more may
+    wait for a worker; anything beyond that is shed with a 503.
+    """
+
+    def __init__(self, kind: str, workers: int, max_queue: int):
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = None
+        self.pending = 0
+        self.peak_pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        
+        self.pending += 1
+        self.submitted += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release(start, fn.__name__)
+            raise
+        
+        # The slot is held until the executor is done with the job, not until
+        # the caller stops waiting: a cancelled request (client gone) leaves a
+        # running job behind, and that still counts against the queue bound
+        def done(_):
+            try:
+                loop.call_soon_threadsafe(self._release, start, fn.__name__)
+            except RuntimeError:
+                pass  # Loop already closed at shutdown
+        
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, start: float, operation: str):
+        elapsed = time.perf_counter() - start
+        self.pending -= 1
+        self.completed += 1
+        self.total_seconds += elapsed
+        BCRYPT_LATENCY.observe(elapsed, operation=operation)
+
+    def stats(self) -> dict:
+        capacity = self.workers + self.max_queue
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(self.pending, self.workers),
+            "queued": max(0, self.pending - self.workers),
+            "peak_pending": self.peak_pending,
+            "saturation": self.pending / capacity,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_seconds": self.total_seconds / self.completed if self.completed else 0.0
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_pool = PasswordPool(PASSWORD_POOL_KIND, PASSWORD_POOL_WORKERS, PASSWORD_POOL_MAX_QUEUE)
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(hash_password, password)
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    return await password_pool.run(verify_password, password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -169,288 +809,3103 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class PrincipalCache:
+    """Bounded LRU of authenticated users keyed by user id.
+
+    Entries expire after ``ttl`` seconds so a token version bumped by another
+    worker is picked up within one TTL.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str):
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(user_id, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, user_id: str, principal: "User", token_version: int):
+        self._entries[user_id] = (time.monotonic() + self.ttl, principal, token_version)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return principal, token_version
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
+
+def user_from_document(user: dict) -> "User":
+    return User(
+        id=user["id"],
+        email=user["email"],
+        name=user["name"],
+        role=user["role"],
+        phone=user.get("phone"),
+        created_at=user["created_at"]
+    )
+
+def token_claims(user: dict) -> dict:
+    # "ver" is always included so revocation also covers email-only tokens
+    claims = {"sub": user["email"], "ver": user.get("token_version", 0)}
+    if AUTH_SIGNED_CLAIMS:
+        claims.update({
+            "uid": user["id"],
+            "role": user["role"],
+            "name": user["name"]
+        })
+    return claims
+
+async def load_principal(user_id: str):
+    user = await users_collection.find_one({"id": user_id}, {"_id": 0, "password": 0})
+    if user is None:
+        principal_cache.invalidate(user_id)
+        return None
+    return principal_cache.put(user_id, user_from_document(user), user.get("token_version", 0))
+
+def invalidate_principal(user_id: str):
+    principal_cache.invalidate(user_id)
+
+async def revoke_user_tokens(user_id: str) -> bool:
+    result = await users_collection.update_one({"id": user_id}, {"$inc": {"token_version": 1}})
+    invalidate_principal(user_id)
+    return result.matched_count > 0
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    start = time.perf_counter()
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        
-        user = await users_collection.find_one({"email": email})
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        
-        return User(
-            id=user["id"],
-            email=user["email"],
-            name=user["name"],
-            role=user["role"],
-            phone=user.get("phone"),
-            created_at=user["created_at"]
-        )
+        return await authenticate(credentials.credentials)
+    finally:
+        AUTH_LATENCY.observe(time.perf_counter() - start)
+
+async def authenticate(token: str) -> User:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-
-# Routes
-@app.get("/api/")
-async def root():
-    return {"message": "Union Law Firm API is running"}
-
-@app.post("/api/auth/register")
-async def register(user: UserCreate):
-    # Check if user already exists
-    existing_user = await users_collection.find_one({"email": user.email})
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Create new user
-    user_id = str(uuid.uuid4())
-    hashed_password = hash_password(user.password)
+    email: str = payload.get("sub")
+    if email is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     
-    user_data = {
-        "id": user_id,
-        "email": user.email,
-        "password": hashed_password,
-        "name": user.name,
-        "role": UserRole.CLIENT,
-        "phone": user.phone,
-        "created_at": datetime.utcnow()
-    }
+    user_id = payload.get("uid")
+    if AUTH_SIGNED_CLAIMS and user_id:
+        token_version = payload.get("ver", 0)
+        cached = principal_cache.get(user_id)
+        # A newer token than the cached version means the cache is stale
+        if cached is None or cached[1] < token_version:
+            cached = await load_principal(user_id)
+        if cached is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        
+        principal, current_version = cached
+        if token_version != current_version:
+            raise HTTPException(status_code=401, detail="Token has been revoked")
+        return principal
     
-    await users_collection.insert_one(user_data)
+    # Legacy tokens only carry the email (and tokens issued before
+    # revocation existed carry no version, which reads as version 0)
+    user = await users_collection.find_one({"email": email}, {"_id": 0, "password": 0})
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    if payload.get("ver", 0) != user.get("token_version", 0):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
     
-    # Create access token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
+    return user_from_document(user)
+
+USER_BATCH_SIZE = 500
+
+async def resolve_users(docs: list, identity_map: Optional[dict] = None) -> dict:
+    # Fetches the owners of docs with a single projected $in query, skipping
+    # users already present in identity_map
+    if identity_map is None:
+        identity_map = {}
+    missing = {doc["user_id"] for doc in docs if doc["user_id"] not in identity_map}
+    if missing:
+        async for user in users_collection.find(
+            {"id": {"$in": list(missing)}},
+            {"_id": 0, "id": 1, "name": 1, "email": 1}
+        ):
+            identity_map[user["id"]] = user
+    return identity_map
+
+async def iter_with_users(cursor, batch_size: int = USER_BATCH_SIZE):
+    # Resolves each document's owner batch by batch, remembering users
+    # already seen so each one is fetched at most once
+    identity_map = {}
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await resolve_users(batch, identity_map)
+            for item in batch:
+                yield item, identity_map.get(item["user_id"])
+            batch = []
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": {
-            "id": user_id,
-            "email": user.email,
-            "name": user.name,
-            "role": UserRole.CLIENT
-        }
-    }
+    if batch:
+        await resolve_users(batch, identity_map)
+        for item in batch:
+            yield item, identity_map.get(item["user_id"])
 
-@app.post("/api/auth/login")
-async def login(user: UserLogin):
-    db_user = await users_collection.find_one({"email": user.email})
-    if not db_user or not verify_password(user.password, db_user["password"]):
-        raise HTTPException(status_code=401, detail="Invalid email or password")
+def encode_cursor(doc: dict) -> str:
+    raw = json.dumps([doc["created_at"].isoformat(), doc["id"]]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return naive_utc(datetime.fromisoformat(created_at)), str(doc_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def add_date_range(query: dict, field: str, date_from: Optional[datetime], date_to: Optional[datetime]) -> dict:
+    bounds = {}
+    if date_from is not None:
+        bounds["$gte"] = date_from
+    if date_to is not None:
+        bounds["$lt"] = date_to
+    if bounds:
+        query[field] = bounds
+    return query
+
+def case_query(
+    status: Optional[CaseStatus] = None,
+    case_type: Optional[CaseType] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    user_id: Optional[str] = None
+) -> dict:
+    query = {}
+    if user_id:
+        query["user_id"] = user_id
+    if status:
+        query["status"] = status
+    if case_type:
+        query["case_type"] = case_type
+    return add_date_range(query, "created_at", created_from, created_to)
+
+def appointment_query(
+    status: Optional[AppointmentStatus] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    user_id: Optional[str] = None
+) -> dict:
+    query = {}
+    if user_id:
+        query["user_id"] = user_id
+    if status:
+        query["status"] = status
+    return add_date_range(query, "created_at", created_from, created_to)
+
+async def fetch_page(collection, query: dict, cursor: Optional[str], sort: SortOrder, limit: int, projection: Optional[dict] = None):
+    # Keyset pagination on (created_at, id): the cursor is the last row of the
+    # previous page, so every page is an index range scan regardless of depth
+    direction = DESCENDING if sort == SortOrder.DESC else ASCENDING
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        op = "$lt" if sort == SortOrder.DESC else "$gt"
+        query = {"$and": [query, {"$or": [
+            {"created_at": {op: created_at}},
+            {"created_at": created_at, "id": {op: doc_id}}
+        ]}]}
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
+    docs = await collection.find(query, projection).sort(
+        [("created_at", direction), ("id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": {
-            "id": db_user["id"],
-            "email": db_user["email"],
-            "name": db_user["name"],
-            "role": db_user["role"]
-        }
-    }
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
 
-@app.get("/api/auth/me")
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
-    return current_user
+upload_write_semaphore = asyncio.Semaphore(UPLOAD_WRITE_CONCURRENCY)
 
-@app.post("/api/cases")
-async def create_case(
-    case_type: CaseType = Form(...),
-    title: str = Form(...),
-    description: str = Form(...),
-    files: List[UploadFile] = File(default=[]),
-    current_user: User = Depends(get_current_user)
-):
-    # Create uploads directory if it doesn't exist
-    upload_dir = "/app/uploads"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Save uploaded files
-    file_paths = []
-    for file in files:
-        if file.filename:
-            file_extension = os.path.splitext(file.filename)[1]
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = os.path.join(upload_dir, unique_filename)
-            
-            async with aiofiles.open(file_path, 'wb') as out_file:
-                content = await file.read()
-                await out_file.write(content)
-            
-            file_paths.append(unique_filename)
+def case_files(case: dict) -> List[dict]:
+    # Cases created before file metadata was recorded store bare filenames
+    return [{"name": f} if isinstance(f, str) else f for f in case.get("files", [])]
+
+def normalize_case(case: dict) -> dict:
+    case["files"] = case_files(case)
+    return case
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(BLOB_DIR, sha256[:2], sha256[2:4], sha256)
+
+def stored_file_path(file: dict) -> str:
+    if file.get("storage") == "blob":
+        return blob_path(file["sha256"])
+    # Files uploaded before the blob store are kept flat in UPLOAD_DIR
+    return os.path.join(UPLOAD_DIR, file["name"])
+
+async def save_upload(file: UploadFile, request_bytes: dict):
+    # Copies the upload to a temporary file in UPLOAD_CHUNK_BYTES chunks,
+    # hashing and enforcing the per-file and per-request limits as bytes arrive
+    if file.size is not None and file.size > MAX_UPLOAD_FILE_BYTES:
+        raise HTTPException(status_code=413, detail=f"File {file.filename} is too large")
     
-    # Create case
-    case_id = str(uuid.uuid4())
-    case_data = {
-        "id": case_id,
-        "user_id": current_user.id,
-        "case_type": case_type,
-        "title": title,
-        "description": description,
-        "status": CaseStatus.PENDING,
-        "files": file_paths,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    }
+    tmp_path = os.path.join(UPLOAD_TMP_DIR, str(uuid.uuid4()))
+    digest = hashlib.sha256()
+    size = 0
     
-    await cases_collection.insert_one(case_data)
+    async with upload_write_semaphore:
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as out_file:
+                while True:
+                    chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    
+                    size += len(chunk)
+                    request_bytes["total"] += len(chunk)
+                    if size > MAX_UPLOAD_FILE_BYTES:
+                        raise HTTPException(status_code=413, detail=f"File {file.filename} is too large")
+                    if request_bytes["total"] > MAX_UPLOAD_REQUEST_BYTES:
+                        raise HTTPException(status_code=413, detail="Total upload size is too large")
+                    
+                    digest.update(chunk)
+                    await out_file.write(chunk)
+                    UPLOAD_BYTES.inc(len(chunk), source="multipart")
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
     
-    return {
-        "message": "Case submitted successfully",
-        "case_id": case_id,
-        "status": CaseStatus.PENDING
+    file_extension = os.path.splitext(file.filename)[1]
+    return tmp_path, {
+        "name": f"{uuid.uuid4()}{file_extension}",
+        "original_name": file.filename,
+        "content_type": file.content_type or mimetypes.guess_type(file.filename)[0],
+        "size": size,
+        "sha256": digest.hexdigest(),
+        "storage": "blob",
+        "uploaded_at": datetime.utcnow()
     }
 
-@app.get("/api/cases")
-async def get_user_cases(current_user: User = Depends(get_current_user)):
-    cases = []
-    async for case in cases_collection.find({"user_id": current_user.id}):
-        cases.append({
-            "id": case["id"],
-            "case_type": case["case_type"],
-            "title": case["title"],
-            "description": case["description"],
-            "status": case["status"],
-            "files": case["files"],
-            "created_at": case["created_at"],
-            "updated_at": case["updated_at"]
-        })
+def commit_blob(tmp_path: str, sha256: str) -> bool:
+    # Moves a finished upload into the blob store; returns True when the
+    # content was already stored and the upload was a duplicate
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+        # Refresh the mtime so the collector's grace period starts over
+        os.utime(path)
+        return True
     
-    return cases
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+    return False
 
-@app.get("/api/cases/{case_id}")
-async def get_case(case_id: str, current_user: User = Depends(get_current_user)):
-    case = await cases_collection.find_one({"id": case_id, "user_id": current_user.id})
-    if not case:
-        raise HTTPException(status_code=404, detail="Case not found")
+async def save_uploads(files: List[UploadFile]) -> List[dict]:
+    os.makedirs(UPLOAD_TMP_DIR, exist_ok=True)
+    request_bytes = {"total": 0}
+    results = await asyncio.gather(
+        *(save_upload(file, request_bytes) for file in files if file.filename),
+        return_exceptions=True
+    )
     
-    return {
-        "id": case["id"],
-        "case_type": case["case_type"],
-        "title": case["title"],
-        "description": case["description"],
-        "status": case["status"],
-        "files": case["files"],
-        "created_at": case["created_at"],
-        "updated_at": case["updated_at"]
-    }
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        # Don't leave the files that did make it to disk behind
+        for r in results:
+            if isinstance(r, tuple):
+                os.remove(r[0])
+        raise errors[0]
+    
+    saved_files = []
+    for tmp_path, file in results:
+        commit_blob(tmp_path, file["sha256"])
+        saved_files.append(file)
+    return saved_files
 
-@app.post("/api/appointments")
-async def create_appointment(
-    appointment: AppointmentCreate,
-    current_user: User = Depends(get_current_user)
-):
-    appointment_id = str(uuid.uuid4())
-    appointment_data = {
-        "id": appointment_id,
-        "user_id": current_user.id,
-        "appointment_date": appointment.appointment_date,
-        "status": AppointmentStatus.PENDING,
-        "payment_status": "pending",
-        "amount": 100.0,  # Default consultation fee
-        "notes": appointment.notes,
-        "created_at": datetime.utcnow()
+async def retain_blobs(files: List[dict]):
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"sha256": file["sha256"]},
+            {
+                "$inc": {"refcount": 1},
+                "$set": {"updated_at": now},
+                "$setOnInsert": {"size": file["size"], "created_at": now}
+            },
+            upsert=True
+        )
+        for file in files if file.get("storage") == "blob"
+    ]
+    if operations:
+        await blobs_collection.bulk_write(operations, ordered=False)
+
+async def release_blobs(files: List[dict]):
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne({"sha256": file["sha256"]}, {"$inc": {"refcount": -1}, "$set": {"updated_at": now}})
+        for file in files if file.get("storage") == "blob"
+    ]
+    if operations:
+        await blobs_collection.bulk_write(operations, ordered=False)
+
+def list_stale_files(directory: str, cutoff: float) -> List[str]:
+    stale = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    stale.append(path)
+            except FileNotFoundError:
+                pass
+    return stale
+
+def remove_file(path: str, cutoff: float) -> bool:
+    # A blob touched by a concurrent duplicate upload is left alone
+    try:
+        if os.stat(path).st_mtime >= cutoff:
+            return False
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+async def recount_blob_references() -> int:
+    counts = {}
+    async for row in cases_collection.aggregate([
+        {"$unwind": "$files"},
+        {"$match": {"files.storage": "blob"}},
+        {"$group": {"_id": "$files.sha256", "count": {"$sum": 1}}}
+    ]):
+        counts[row["_id"]] = row["count"]
+    
+    operations = []
+    async for blob in blobs_collection.find({}, {"_id": 0, "sha256": 1, "refcount": 1}):
+        actual = counts.get(blob["sha256"], 0)
+        if blob["refcount"] != actual:
+            operations.append(UpdateOne(
+                {"sha256": blob["sha256"]},
+                {"$set": {"refcount": actual, "updated_at": datetime.utcnow()}}
+            ))
+    if operations:
+        await blobs_collection.bulk_write(operations, ordered=False)
+    return len(operations)
+
+async def collect_garbage(recount: bool = False) -> dict:
+    cutoff = datetime.utcnow() - timedelta(seconds=BLOB_GC_GRACE_SECONDS)
+    cutoff_ts = time.time() - BLOB_GC_GRACE_SECONDS
+    stats = {
+        "recounted": 0,
+        "expired_sessions_removed": 0,
+        "unreferenced_removed": 0,
+        "orphans_removed": 0,
+        "tmp_removed": 0
     }
     
-    await appointments_collection.insert_one(appointment_data)
+    # Resumable uploads that were abandoned or never attached to a case give
+    # back their data (and blob reference) before blobs are swept
+    stats["expired_sessions_removed"] = await expire_upload_sessions()
     
-    return {
-        "message": "Appointment scheduled successfully",
-        "appointment_id": appointment_id,
-        "status": AppointmentStatus.PENDING
-    }
-
-@app.get("/api/appointments")
-async def get_user_appointments(current_user: User = Depends(get_current_user)):
-    appointments = []
-    async for appointment in appointments_collection.find({"user_id": current_user.id}):
-        appointments.append({
-            "id": appointment["id"],
-            "appointment_date": appointment["appointment_date"],
-            "status": appointment["status"],
-            "payment_status": appointment["payment_status"],
-            "amount": appointment["amount"],
-            "notes": appointment.get("notes"),
-            "created_at": appointment["created_at"]
-        })
+    if recount:
+        stats["recounted"] = await recount_blob_references()
     
-    return appointments
+    # Blobs whose last reference went away more than a grace period ago
+    async for blob in blobs_collection.find(
+        {"refcount": {"$lte": 0}, "updated_at": {"$lt": cutoff}},
+        {"_id": 0, "sha256": 1}
+    ):
+        result = await blobs_collection.delete_one({"sha256": blob["sha256"], "refcount": {"$lte": 0}})
+        if result.deleted_count:
+            await asyncio.to_thread(remove_file, blob_path(blob["sha256"]), cutoff_ts)
+            stats["unreferenced_removed"] += 1
+    
+    # Blob files that never got a record, e.g. a request that failed between
+    # writing the file and inserting its case
+    stale_blobs = await asyncio.to_thread(list_stale_files, BLOB_DIR, cutoff_ts)
+    for start in range(0, len(stale_blobs), USER_BATCH_SIZE):
+        batch = {os.path.basename(path): path for path in stale_blobs[start:start + USER_BATCH_SIZE]}
+        async for blob in blobs_collection.find({"sha256": {"$in": list(batch)}}, {"_id": 0, "sha256": 1}):
+            batch.pop(blob["sha256"], None)
+        for path in batch.values():
+            if await asyncio.to_thread(remove_file, path, cutoff_ts):
+                stats["orphans_removed"] += 1
+    
+    # Temporary files left by interrupted uploads
+    for path in await asyncio.to_thread(list_stale_files, UPLOAD_TMP_DIR, cutoff_ts):
+        if await asyncio.to_thread(remove_file, path, cutoff_ts):
+            stats["tmp_removed"] += 1
+    
+    return stats
+
+def upload_session_path(upload_id: str) -> str:
+    return os.path.join(UPLOAD_SESSION_DIR, upload_id)
+
+def parse_upload_metadata(header: Optional[str]) -> dict:
+    # tus Upload-Metadata: comma separated "key base64(value)" pairs
+    metadata = {}
+    for pair in (header or "").split(","):
+        parts = pair.strip().split(" ", 1)
+        if not parts[0]:
+            continue
+        try:
+            metadata[parts[0]] = base64.b64decode(parts[1]).decode('utf-8') if len(parts) > 1 else ""
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Upload-Metadata header")
+    return metadata
+
+def sync_session_file(path: str, offset: int) -> int:
+    # Bytes past the recorded offset were written but never acknowledged
+    # (e.g. the server died mid-PATCH), so they are dropped
+    with open(path, 'ab') as partial:
+        if partial.tell() > offset:
+            partial.truncate(offset)
+        return min(partial.tell(), offset)
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+upload_session_locks = {}
+
+def upload_session_lock(upload_id: str) -> asyncio.Lock:
+    lock = upload_session_locks.get(upload_id)
+    if lock is None:
+        lock = upload_session_locks[upload_id] = asyncio.Lock()
+    return lock
+
+async def get_upload_session(upload_id: str, user_id: str) -> dict:
+    session = await upload_sessions_collection.find_one({"id": upload_id, "user_id": user_id}, {"_id": 0})
+    if not session or session["expires_at"] < datetime.utcnow():
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+async def claim_uploads(upload_ids: List[str], user_id: str) -> List[dict]:
+    # Moves finalized uploads to "attached"; the blob reference each session
+    # took on finalize is handed over to the case
+    claimed = []
+    try:
+        for upload_id in upload_ids:
+            session = await upload_sessions_collection.find_one_and_update(
+                {"id": upload_id, "user_id": user_id, "status": UploadSessionStatus.COMPLETED},
+                {"$set": {"status": UploadSessionStatus.ATTACHED}}
+            )
+            if session is None:
+                raise HTTPException(status_code=400, detail=f"Upload {upload_id} is not finalized")
+            claimed.append(session)
+    except Exception:
+        await unclaim_uploads([session["id"] for session in claimed])
+        raise
+    return [session["file"] for session in claimed]
+
+async def unclaim_uploads(upload_ids: List[str]):
+    if upload_ids:
+        await upload_sessions_collection.update_many(
+            {"id": {"$in": upload_ids}, "status": UploadSessionStatus.ATTACHED},
+            {"$set": {"status": UploadSessionStatus.COMPLETED}}
+        )
+
+async def expire_upload_sessions() -> int:
+    removed = 0
+    async for session in upload_sessions_collection.find(
+        {"expires_at": {"$lt": datetime.utcnow()}},
+        {"_id": 0}
+    ):
+        result = await upload_sessions_collection.delete_one(
+            {"id": session["id"], "status": session["status"]}
+        )
+        if not result.deleted_count:
+            continue
+        # Attached sessions only leave their record behind
+        if session["status"] == UploadSessionStatus.COMPLETED:
+            await release_blobs([session["file"]])
+        elif session["status"] == UploadSessionStatus.IN_PROGRESS:
+            path = upload_session_path(session["id"])
+            if os.path.exists(path):
+                await asyncio.to_thread(os.remove, path)
+        upload_session_locks.pop(session["id"], None)
+        removed += 1
+    return removed
+
+def case_access_query(case_id: str, current_user: "User") -> dict:
+    # Clients only see their own cases; admins see every case
+    if current_user.role == UserRole.ADMIN:
+        return {"id": case_id}
+    return {"id": case_id, "user_id": current_user.id}
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+def parse_range(header: Optional[str], size: int):
+    # Returns (start, end) inclusive for a single satisfiable byte range,
+    # None to serve the whole file, or raises 416
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[6:].strip().partition("-")
+    try:
+        if not start_text:
+            length = int(end_text)
+            if length <= 0:
+                raise ValueError
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(start_text)
+            end = min(int(end_text), size - 1) if end_text else size - 1
+    except ValueError:
+        return None
+    
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+class FileRangeResponse(Response):
+    # Streams [start, end] of a file. Uses the ASGI zerocopysend extension
+    # (os.sendfile under the hood) when the server advertises it.
+    def __init__(self, path: str, start: int, end: int, status_code: int, headers: dict, media_type: str):
+        headers["Content-Length"] = str(end - start + 1)
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        count = self.end - self.start + 1
+        if scope["method"] == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        
+        with open(self.path, 'rb') as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.start,
+                    "count": count,
+                    "more_body": False
+                })
+                return
+            
+            offset = self.start
+            while count > 0:
+                chunk = await asyncio.to_thread(os.pread, f.fileno(), min(DOWNLOAD_CHUNK_BYTES, count), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                count -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": count > 0})
+        
+        if count > 0:
+            # The file shrank underneath us; end the response
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+def file_response(request: Request, file: dict):
+    path = stored_file_path(file)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    size = stat.st_size
+    etag = f'"{file["sha256"]}"' if file.get("sha256") else f'"{stat.st_mtime_ns:x}-{size:x}"'
+    modified = file.get("uploaded_at") or datetime.utcfromtimestamp(stat.st_mtime)
+    modified_ts = int(modified.replace(tzinfo=timezone.utc).timestamp())
+    original_name = file.get("original_name") or file["name"]
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(modified_ts, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=0, must-revalidate",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(original_name)}"
+    }
+    
+    # Conditional GET: If-None-Match takes precedence over If-Modified-Since
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    elif request.headers.get("If-Modified-Since"):
+        try:
+            since = parsedate_to_datetime(request.headers["If-Modified-Since"])
+            if modified_ts <= since.timestamp():
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+    
+    byte_range = None
+    if_range = request.headers.get("If-Range")
+    if if_range is None or if_range.strip() == etag:
+        byte_range = parse_range(request.headers.get("Range"), size)
+    
+    media_type = file.get("content_type") or mimetypes.guess_type(original_name)[0] or "application/octet-stream"
+    
+    if FILE_ACCEL_REDIRECT_PREFIX:
+        # The proxy serves the bytes (and handles Range) with sendfile
+        relative_path = os.path.relpath(path, UPLOAD_DIR)
+        headers["X-Accel-Redirect"] = FILE_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(relative_path)
+        return Response(status_code=200, headers=headers, media_type=media_type)
+    
+    if byte_range is None:
+        return FileRangeResponse(path, 0, size - 1, 200, headers, media_type)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return FileRangeResponse(path, start, end, 206, headers, media_type)
+
+async def blob_gc_loop():
+    while True:
+        await asyncio.sleep(BLOB_GC_INTERVAL_SECONDS)
+        try:
+            await collect_garbage()
+        except Exception as e:
+            print(f"Blob garbage collection failed: {e}")
+
+CASE_EXPORT_FIELDS = [
+    "id", "user_id", "user_name", "user_email", "case_type", "title", "description",
+    "status", "files", "created_at", "updated_at"
+]
+APPOINTMENT_EXPORT_FIELDS = [
+    "id", "user_id", "user_name", "user_email", "appointment_date", "status",
+    "payment_status", "amount", "notes", "created_at"
+]
+
+def export_value(value):
+    # CSV cell value; nested lists and dicts are written as JSON
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (list, dict)):
+        return orjson.dumps(value).decode('utf-8')
+    return value
+
+async def stream_export(cursor, fields: List[str], export_format: ExportFormat, compress: bool):
+    # Rows are encoded batch by batch straight off the cursor and flushed in
+    # EXPORT_CHUNK_BYTES chunks; each yield waits for the client to drain the
+    # previous chunk, so memory stays flat whatever the export size
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if export_format == ExportFormat.CSV else None
+    
+    def take_chunk() -> bytes:
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+    
+    if writer:
+        writer.writerow(fields)
+    
+    async for doc, user in iter_with_users(cursor):
+        row = dict(doc)
+        row["user_name"] = user["name"] if user else "Unknown"
+        row["user_email"] = user["email"] if user else "Unknown"
+        if writer:
+            writer.writerow([
+                ";".join(f["name"] for f in case_files(row)) if field == "files" else export_value(row.get(field))
+                for field in fields
+            ])
+        else:
+            if "files" in row:
+                row["files"] = case_files(row)
+            # orjson also encodes the datetimes nested in file entries
+            buffer.write(orjson.dumps({field: row.get(field) for field in fields}).decode('utf-8'))
+            buffer.write("\n")
+        
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            chunk = take_chunk()
+            if chunk:
+                yield chunk
+    
+    chunk = take_chunk()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+def export_response(cursor, fields: List[str], export_format: ExportFormat, compress: bool, name: str):
+    if export_format == ExportFormat.CSV:
+        media_type, extension = "text/csv; charset=utf-8", "csv"
+    else:
+        media_type, extension = "application/x-ndjson", "ndjson"
+    
+    headers = {"Content-Disposition": f'attachment; filename="{name}.{extension}"'}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(
+        stream_export(cursor, fields, export_format, compress),
+        media_type=media_type,
+        headers=headers
+    )
+
+class ViewCounter:
+    """Coalesces video view increments into periodic bulk writes.
+
+    Every view is appended to a per-worker journal file before it is counted
+    in memory. A flush seals the journal, applies all pending counts with one
+    unordered bulk_write and deletes the sealed journals only once that
+    succeeds. Journals left behind by a crashed worker are replayed on the
+    next startup, so views are applied at least once.
+    """
+
+    def __init__(self, journal_dir: str):
+        self.journal_dir = journal_dir
+        self.pending = {}
+        self.fd = None
+        self.journal_path = None
+        self.sealed = []
+        # Running totals per video for this worker, used to layer views on
+        # top of cached catalogue snapshots
+        self.recorded = {}
+        self.applied = {}
+        self.flushes = 0
+        self.flushed_views = 0
+        self.failures = 0
+        self._lock = asyncio.Lock()
+
+    def open(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        name = f"views-{os.getpid()}-{uuid.uuid4().hex}"
+        # Created and locked under a name replay_orphans skips, then renamed:
+        # a ".log" journal is never visible unlocked to other workers
+        tmp_path = os.path.join(self.journal_dir, f"{name}.tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        # Held for the worker's lifetime so other workers never replay a live journal
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.journal_path = os.path.join(self.journal_dir, f"{name}.log")
+        os.rename(tmp_path, self.journal_path)
+        self.fd = fd
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            if not self.pending and os.path.getsize(self.journal_path) == 0:
+                os.remove(self.journal_path)
+            self.fd = None
+
+    def record(self, video_id: str) -> int:
+        if self.fd is not None:
+            os.write(self.fd, (video_id + "\n").encode('utf-8'))
+        count = self.pending.get(video_id, 0) + 1
+        self.pending[video_id] = count
+        self.recorded[video_id] = self.recorded.get(video_id, 0) + 1
+        return count
+
+    def buffered(self, video_id: str) -> int:
+        return self.pending.get(video_id, 0)
+
+    async def apply(self, counts: dict):
+        await videos_collection.bulk_write(
+            [UpdateOne({"id": video_id}, {"$inc": {"views": count}}) for video_id, count in counts.items()],
+            ordered=False
+        )
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self.pending:
+                return 0
+            
+            batch, self.pending = self.pending, {}
+            if self.fd is not None:
+                self.sealed.append((self.fd, self.journal_path))
+                self.open()
+            
+            try:
+                await self.apply(batch)
+            except Exception:
+                # Counts go back into the buffer and the sealed journals stay
+                # on disk until a later flush succeeds
+                for video_id, count in batch.items():
+                    self.pending[video_id] = self.pending.get(video_id, 0) + count
+                self.failures += 1
+                raise
+            
+            for video_id, count in batch.items():
+                self.applied[video_id] = self.applied.get(video_id, 0) + count
+            # Taken off the list before closing so a failure below can never
+            # lead a later flush to close the same fd numbers again
+            sealed, self.sealed = self.sealed, []
+            for fd, path in sealed:
+                os.close(fd)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self.flushes += 1
+            self.flushed_views += sum(batch.values())
+            return len(batch)
+
+    async def replay_orphans(self) -> int:
+        replayed = 0
+        for name in os.listdir(self.journal_dir):
+            path = os.path.join(self.journal_dir, name)
+            if path == self.journal_path or not name.endswith(".log"):
+                continue
+            
+            try:
+                fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                continue
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Still owned by a running worker
+                    continue
+                # Another worker may have replayed and unlinked it while we waited
+                if not os.path.exists(path) or os.stat(path).st_ino != os.fstat(fd).st_ino:
+                    continue
+                
+                counts = {}
+                with os.fdopen(os.dup(fd), 'r', encoding='utf-8') as journal:
+                    for line in journal:
+                        video_id = line.strip()
+                        if video_id:
+                            counts[video_id] = counts.get(video_id, 0) + 1
+                if counts:
+                    await self.apply(counts)
+                os.remove(path)
+                replayed += sum(counts.values())
+            finally:
+                os.close(fd)
+        return replayed
+
+    def stats(self) -> dict:
+        return {
+            "buffered_videos": len(self.pending),
+            "buffered_views": sum(self.pending.values()),
+            "flushes": self.flushes,
+            "flushed_views": self.flushed_views,
+            "failures": self.failures
+        }
+
+view_counter = ViewCounter(VIEW_JOURNAL_DIR)
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Mongo hands back naive UTC datetimes; query parameters may be aware
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+class VideoCatalogue:
+    """Read-through, in-memory copy of the videos collection.
+
+    The whole catalogue is loaded at once (it is small and rarely changes)
+    and each distinct page is serialized once, together with a content-hash
+    ETag, until the TTL runs out or invalidate() is called.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.expires_at = 0.0
+        self.videos = []
+        self.by_id = {}
+        self.applied_at_load = {}
+        self.pages = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self.expires_at = 0.0
+
+    async def load(self):
+        if self.expires_at > time.monotonic():
+            return
+        async with self._lock:
+            if self.expires_at > time.monotonic():
+                return
+            # Read under the view counter's lock so the snapshot's views and
+            # the flushed totals line up exactly
+            async with view_counter._lock:
+                videos = await videos_collection.find({}, VIDEO_FIELDS).sort(
+                    [("created_at", DESCENDING), ("id", DESCENDING)]
+                ).to_list(None)
+                applied_at_load = dict(view_counter.applied)
+            self.videos = videos
+            self.by_id = {video["id"]: video for video in videos}
+            self.applied_at_load = applied_at_load
+            self.pages.clear()
+            self.expires_at = time.monotonic() + self.ttl
+
+    async def get(self, video_id: str) -> Optional[dict]:
+        await self.load()
+        return self.by_id.get(video_id)
+
+    def current_views(self, video: dict) -> int:
+        # Views since the snapshot, flushed or still buffered in this worker
+        video_id = video["id"]
+        return video["views"] + view_counter.recorded.get(video_id, 0) - self.applied_at_load.get(video_id, 0)
+
+    async def page(
+        self,
+        category: Optional[str],
+        created_from: Optional[datetime],
+        created_to: Optional[datetime],
+        sort: SortOrder,
+        cursor: Optional[str],
+        limit: int
+    ):
+        await self.load()
+        key = (category, created_from, created_to, sort, cursor, limit)
+        cached = self.pages.get(key)
+        if cached is not None:
+            self.pages.move_to_end(key)
+            return cached
+        
+        created_from, created_to = naive_utc(created_from), naive_utc(created_to)
+        items = self.videos if sort == SortOrder.DESC else self.videos[::-1]
+        if category:
+            items = [v for v in items if v["category"] == category]
+        if created_from:
+            items = [v for v in items if v["created_at"] >= created_from]
+        if created_to:
+            items = [v for v in items if v["created_at"] < created_to]
+        if cursor:
+            position = decode_cursor(cursor)
+            if sort == SortOrder.DESC:
+                items = [v for v in items if (v["created_at"], v["id"]) < position]
+            else:
+                items = [v for v in items if (v["created_at"], v["id"]) > position]
+        
+        next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+        body = orjson.dumps({"items": items[:limit], "next_cursor": next_cursor})
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        
+        self.pages[key] = (body, etag)
+        while len(self.pages) > VIDEO_CATALOGUE_MAX_PAGES:
+            self.pages.popitem(last=False)
+        return body, etag
+
+video_catalogue = VideoCatalogue(VIDEO_CATALOGUE_TTL_SECONDS)
+
+def invalidate_video_catalogue():
+    # Call after adding or editing videos
+    video_catalogue.invalidate()
+
+async def view_flush_loop():
+    while True:
+        await asyncio.sleep(VIEW_FLUSH_INTERVAL_SECONDS)
+        try:
+            await view_counter.flush()
+        except Exception as e:
+            print(f"Video view flush failed: {e}")
+
+# Case status events
+HEARTBEAT = object()
+RESYNC = object()
+
+class CaseEventSubscriber:
+    __slots__ = ("user_id", "queue", "lagged")
+    
+    def __init__(self, user_id: str, buffer_size: int):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(buffer_size)
+        self.lagged = False
+
+class CaseEventBroker:
+    """In-process fan-out of case status changes to per-user SSE subscribers.
+    
+    Events are (seq, user_id, event id, serialized data) tuples; the recent
+    ones are kept in a ring so reconnecting clients can resume from
+    Last-Event-ID. Idle subscribers hold nothing but an empty queue and are
+    woken by one shared heartbeat.
+    """
+    
+    def __init__(self, buffer_size: int, history_size: int):
+        self.buffer_size = buffer_size
+        # Event ids are "<epoch>-<seq>"; ids from another worker or an earlier
+        # process can't be resumed from this history
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.history = deque(maxlen=history_size)
+        self.subscribers = {}
+        self.published = 0
+        self.lagged = 0
+    
+    def subscribe(self, user_id: str) -> CaseEventSubscriber:
+        subscriber = CaseEventSubscriber(user_id, self.buffer_size)
+        self.subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber: CaseEventSubscriber):
+        subscribers = self.subscribers.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[subscriber.user_id]
+    
+    def head_id(self) -> str:
+        return f"{self.epoch}-{self.seq}"
+    
+    def publish(self, user_id: str, data: dict):
+        self.seq += 1
+        event = (self.seq, user_id, self.head_id(), orjson.dumps(data))
+        self.history.append(event)
+        self.published += 1
+        for subscriber in self.subscribers.get(user_id, ()):
+            self.offer(subscriber, event)
+    
+    def offer(self, subscriber: CaseEventSubscriber, item):
+        if subscriber.lagged:
+            return
+        try:
+            subscriber.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # A consumer this far behind drops its backlog and is told to
+            # refetch instead
+            subscriber.lagged = True
+            self.lagged += 1
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(RESYNC)
+    
+    def replay(self, user_id: str, last_event_id: str) -> Optional[list]:
+        # None means the client missed events we no longer have
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self.seq:
+            return None
+        seq = int(seq)
+        if self.history and seq < self.history[0][0] - 1:
+            return None
+        return [event for event in self.history if event[0] > seq and event[1] == user_id]
+    
+    def heartbeat(self):
+        for subscribers in self.subscribers.values():
+            for subscriber in subscribers:
+                if subscriber.queue.empty():
+                    subscriber.queue.put_nowait(HEARTBEAT)
+    
+    def stats(self) -> dict:
+        return {
+            "source": CASE_EVENTS_SOURCE,
+            "subscribers": sum(len(s) for s in self.subscribers.values()),
+            "users": len(self.subscribers),
+            "published": self.published,
+            "lagged": self.lagged,
+            "history": len(self.history)
+        }
+
+case_events = CaseEventBroker(CASE_EVENTS_BUFFER, CASE_EVENTS_HISTORY)
+
+def case_event(case_id: str, status: str, previous_status: Optional[str], updated_at: datetime) -> dict:
+    return {
+        "case_id": case_id,
+        "status": status,
+        "previous_status": previous_status,
+        "updated_at": updated_at
+    }
+
+def publish_case_status(user_id: str, data: dict):
+    # With a change stream the event arrives from there on every worker
+    if CASE_EVENTS_SOURCE == "local":
+        case_events.publish(user_id, data)
+
+def format_sse(event: str, data: bytes, event_id: Optional[str] = None) -> bytes:
+    frame = f"id: {event_id}\n" if event_id else ""
+    return f"{frame}event: {event}\n".encode() + b"data: " + data + b"\n\n"
+
+async def case_events_heartbeat_loop():
+    while True:
+        await asyncio.sleep(CASE_EVENTS_HEARTBEAT_SECONDS)
+        case_events.heartbeat()
+
+async def case_events_change_stream_loop():
+    pipeline = [{"$match": {
+        "operationType": "update",
+        "updateDescription.updatedFields.status": {"$exists": True}
+    }}]
+    resume_token = None
+    while True:
+        try:
+            async with cases_collection.watch(
+                pipeline, full_document="updateLookup", resume_after=resume_token
+            ) as stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    case = change.get("fullDocument")
+                    if case is None:
+                        continue
+                    fields = change["updateDescription"]["updatedFields"]
+                    case_events.publish(case["user_id"], case_event(
+                        case["id"], fields["status"], None, fields.get("updated_at", case["updated_at"])
+                    ))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Case event change stream failed: {e}")
+            await asyncio.sleep(5)
+
+async def case_event_stream(user_id: str, last_event_id: Optional[str], expires_at: float):
+    subscriber = case_events.subscribe(user_id)
+    try:
+        yield f"retry: {CASE_EVENTS_RETRY_MS}\n\n".encode()
+        
+        # Subscribed before replaying, so events published in between are in
+        # both; sent tracks what the client already has
+        sent = 0
+        if last_event_id:
+            events = case_events.replay(user_id, last_event_id)
+            if events is None:
+                sent = case_events.seq
+                yield format_sse("resync", b"{}", case_events.head_id())
+            else:
+                for seq, _, event_id, data in events:
+                    sent = seq
+                    yield format_sse("status", data, event_id)
+        
+        while True:
+            item = await subscriber.queue.get()
+            # Expired tokens end the stream; the client reconnects with a new one
+            if time.time() >= expires_at:
+                return
+            if item is HEARTBEAT:
+                yield b": keepalive\n\n"
+            elif item is RESYNC:
+                subscriber.lagged = False
+                sent = case_events.seq
+                yield format_sse("resync", b"{}", case_events.head_id())
+            elif item[0] > sent:
+                sent = item[0]
+                yield format_sse("status", item[3], item[2])
+    finally:
+        case_events.unsubscribe(subscriber)
+
+# Background jobs. Handlers are registered per job kind with @job_handler;
+# workers claim due jobs with a lease, so a job held by a crashed worker is
+# picked up again once its lease runs out
+JOB_HANDLERS = {}
+job_worker_wakeups = set()
+
+def job_handler(kind: str, on_failure=None):
+    # on_failure(payload, error) runs once a job has used up its attempts
+    def register(fn):
+        JOB_HANDLERS[kind] = (fn, on_failure)
+        return fn
+    return register
+
+class JobProcessPool:
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._executor = None
+    
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+job_process_pool = JobProcessPool(JOB_PROCESS_WORKERS)
+
+async def enqueue_jobs(kind: str, payloads: list):
+    if not payloads:
+        return
+    now = datetime.utcnow()
+    await jobs_collection.insert_many([{
+        "id": str(uuid.uuid4()),
+        "kind": kind,
+        "payload": payload,
+        "status": JobStatus.QUEUED,
+        "attempts": 0,
+        "max_attempts": JOB_MAX_ATTEMPTS,
+        "run_at": now,
+        "locked_until": None,
+        "worker": None,
+        "last_error": None,
+        "result": None,
+        "created_at": now,
+        "updated_at": now
+    } for payload in payloads])
+    wake_job_workers()
+
+def wake_job_workers():
+    for wakeup in job_worker_wakeups:
+        wakeup.set()
+
+async def claim_job() -> Optional[dict]:
+    now = datetime.utcnow()
+    return await jobs_collection.find_one_and_update(
+        {"$or": [
+            {"status": JobStatus.QUEUED, "run_at": {"$lte": now}},
+            {"status": JobStatus.RUNNING, "locked_until": {"$lt": now}}
+        ]},
+        {
+            "$set": {
+                "status": JobStatus.RUNNING,
+                "locked_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                "worker": JOB_WORKER_ID,
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("run_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+def job_retry_delay(attempts: int) -> float:
+    # Exponential backoff with jitter so failed jobs don't retry in lockstep
+    delay = min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+async def run_job(job: dict):
+    kind = job["kind"]
+    owned = {"id": job["id"], "worker": JOB_WORKER_ID}
+    start = time.perf_counter()
+    handler, on_failure = JOB_HANDLERS.get(kind, (None, None))
+    try:
+        if handler is None:
+            raise RuntimeError(f"No handler registered for job kind {kind!r}")
+        result = await handler(job["payload"])
+    except asyncio.CancelledError:
+        # Shutting down: hand the job back without spending an attempt
+        await jobs_collection.update_one(owned, {
+            "$set": {"status": JobStatus.QUEUED, "locked_until": None, "worker": None},
+            "$inc": {"attempts": -1}
+        })
+        raise
+    except Exception as e:
+        JOB_RUNS.inc(kind=kind, result="error")
+        now = datetime.utcnow()
+        error = f"{type(e).__name__}: {e}"
+        if handler is not None and job["attempts"] < job["max_attempts"]:
+            await jobs_collection.update_one(owned, {"$set": {
+                "status": JobStatus.QUEUED,
+                "run_at": now + timedelta(seconds=job_retry_delay(job["attempts"])),
+                "locked_until": None,
+                "last_error": error,
+                "updated_at": now
+            }})
+            return
+        
+        print(f"Job {job['id']} ({kind}) failed after {job['attempts']} attempts: {error}")
+        await jobs_collection.update_one(owned, {"$set": {
+            "status": JobStatus.FAILED, "locked_until": None, "last_error": error, "updated_at": now
+        }})
+        if on_failure is not None:
+            try:
+                await on_failure(job["payload"], error)
+            except Exception as hook_error:
+                print(f"Failure hook for job {job['id']} failed: {hook_error}")
+        return
+    finally:
+        JOB_LATENCY.observe(time.perf_counter() - start, kind=kind)
+    
+    JOB_RUNS.inc(kind=kind, result="succeeded")
+    await jobs_collection.update_one(owned, {"$set": {
+        "status": JobStatus.SUCCEEDED,
+        "locked_until": None,
+        "last_error": None,
+        "result": result,
+        "updated_at": datetime.utcnow()
+    }})
+
+async def job_worker_loop():
+    # Idle workers poll, and are woken early when this process enqueues work
+    wakeup = asyncio.Event()
+    job_worker_wakeups.add(wakeup)
+    try:
+        while True:
+            wakeup.clear()
+            try:
+                job = await claim_job()
+            except Exception as e:
+                print(f"Job claim failed: {e}")
+                job = None
+            
+            if job is None:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            try:
+                await run_job(job)
+            except Exception as e:
+                # The job's lease runs out and another claim picks it up
+                print(f"Job {job['id']} bookkeeping failed: {e}")
+    finally:
+        job_worker_wakeups.discard(wakeup)
+
+# Post-upload file processing: one "process_file" job per attached file runs
+# every registered file processor and records the results on the case's
+# files entry. Processors are plain functions of (path, file) so CPU-bound
+# ones can run in the job process pool.
+FILE_PROCESSORS = []
+
+def file_processor(name: str, cpu_bound: bool = False):
+    def register(fn):
+        FILE_PROCESSORS.append((name, fn, cpu_bound))
+        return fn
+    return register
+
+FILE_SIGNATURES = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/x-ole-storage"),
+]
+# Container formats whose declared type is more specific than the signature
+FILE_SIGNATURE_ALIASES = {
+    "application/zip": {
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        "application/x-zip-compressed",
+    },
+    "application/x-ole-storage": {
+        "application/msword", "application/vnd.ms-excel", "application/vnd.ms-powerpoint",
+    },
+}
+# Split so scanners don't flag this source file itself
+EICAR_SIGNATURE = rb"X5O!P%@AP[4\PZX54(P^)7CC)7}$" + rb"EICAR-STANDARD-ANTIVIRUS-TEST-FILE!$H+H*"
+PDF_STREAM_PATTERN = re.compile(rb"stream\r?\n(.*?)\r?\nendstream", re.S)
+PDF_PAGE_PATTERN = re.compile(rb"/Type\s*/Page\b")
+PDF_TEXT_PATTERN = re.compile(rb"\(((?:[^()\\]|\\.)*)\)\s*(?:Tj|')|\[((?:[^\]\\]|\\.)*)\]\s*TJ", re.S)
+PDF_STRING_PATTERN = re.compile(rb"\(((?:[^()\\]|\\.)*)\)")
+
+def pdf_sections(data: bytes):
+    # The raw file plus every Flate-compressed stream it contains
+    yield data
+    for match in PDF_STREAM_PATTERN.finditer(data):
+        try:
+            yield zlib.decompress(match.group(1))
+        except zlib.error:
+            continue
+
+def read_for_processing(path: str, file: dict) -> Optional[bytes]:
+    if os.path.getsize(path) > FILE_PROCESSING_MAX_BYTES:
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+@file_processor("type")
+def sniff_file_type(path: str, file: dict) -> dict:
+    with open(path, "rb") as f:
+        head = f.read(512)
+    detected = next((t for magic, t in FILE_SIGNATURES if head.startswith(magic)), None)
+    if detected is None and head:
+        try:
+            head.decode("utf-8")
+            detected = "text/plain"
+        except UnicodeDecodeError:
+            pass
+    declared = file.get("content_type") or mimetypes.guess_type(file.get("original_name") or file["name"])[0]
+    mismatch = bool(
+        detected and declared and detected != declared
+        and declared not in FILE_SIGNATURE_ALIASES.get(detected, ())
+        and not (detected == "text/plain" and declared.startswith("text/"))
+    )
+    return {"detected_type": detected, "declared_type": declared, "type_mismatch": mismatch}
+
+@file_processor("pages", cpu_bound=True)
+def count_pdf_pages(path: str, file: dict) -> dict:
+    data = read_for_processing(path, file)
+    if data is None:
+        return {"skipped": "too_large"}
+    if not data.startswith(b"%PDF-"):
+        return {"pages": None}
+    return {"pages": sum(len(PDF_PAGE_PATTERN.findall(section)) for section in pdf_sections(data))}
+
+@file_processor("text", cpu_bound=True)
+def extract_file_text(path: str, file: dict) -> dict:
+    data = read_for_processing(path, file)
+    if data is None:
+        return {"skipped": "too_large"}
+    
+    if data.startswith(b"%PDF-"):
+        parts = []
+        for section in pdf_sections(data):
+            for match in PDF_TEXT_PATTERN.finditer(section):
+                if match.group(1) is not None:
+                    parts.append(match.group(1))
+                else:
+                    parts.extend(PDF_STRING_PATTERN.findall(match.group(2)))
+        text = b" ".join(parts).decode("latin-1")
+    else:
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            return {"text_chars": 0}
+    
+    text = text[:FILE_TEXT_MAX_CHARS]
+    # "terms" is merged into the case's search_terms, not stored with the file
+    terms = sorted(set(tokenize(text)))[:FILE_SEARCH_TERMS_LIMIT]
+    return {"text_chars": len(text), "terms": terms}
+
+@file_processor("scan")
+def scan_file(path: str, file: dict) -> dict:
+    # Local stand-in for a malware scanner: detects the EICAR test signature
+    overlap = len(EICAR_SIGNATURE) - 1
+    tail = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                return {"infected": False, "signature": None}
+            if EICAR_SIGNATURE in tail + chunk:
+                return {"infected": True, "signature": "EICAR-Test-File"}
+            tail = chunk[-overlap:]
+
+def queue_file_processing(files: List[dict]) -> List[dict]:
+    for file in files:
+        file["processing"] = {"status": FileProcessingStatus.QUEUED}
+    return files
+
+async def enqueue_file_processing(case_id: str, files: List[dict]):
+    try:
+        await enqueue_jobs("process_file", [{"case_id": case_id, "name": f["name"]} for f in files])
+    except Exception as e:
+        print(f"Failed to queue processing for case {case_id}: {e}")
+
+async def set_file_processing(case: dict, name: str, processing: dict):
+    await cases_collection.update_one(
+        {"id": case["id"], "files.name": name},
+        {"$set": {"files.$.processing": processing}}
+    )
+    await invalidate_responses([f"cases:{case['user_id']}", f"case:{case['id']}"])
+
+async def file_processing_failed(payload: dict, error: str):
+    case = await cases_collection.find_one({"id": payload["case_id"]}, {"_id": 0, "id": 1, "user_id": 1})
+    if case is None:
+        return
+    await set_file_processing(case, payload["name"], {
+        "status": FileProcessingStatus.FAILED, "error": error, "processed_at": datetime.utcnow()
+    })
+
+@job_handler("process_file", on_failure=file_processing_failed)
+async def process_file_job(payload: dict) -> dict:
+    case = await cases_collection.find_one({"id": payload["case_id"]}, {"_id": 0, "id": 1, "user_id": 1, "files": 1})
+    file = next((f for f in case_files(case or {}) if f["name"] == payload["name"]), None)
+    if file is None:
+        return {"skipped": "file_removed"}
+    
+    await set_file_processing(case, file["name"], {"status": FileProcessingStatus.PROCESSING})
+    
+    loop = asyncio.get_running_loop()
+    path = stored_file_path(file)
+    results = {}
+    terms = []
+    for name, fn, cpu_bound in FILE_PROCESSORS:
+        executor = job_process_pool.executor() if cpu_bound else None
+        result = await loop.run_in_executor(executor, fn, path, file)
+        terms.extend(result.pop("terms", []))
+        results[name] = result
+    
+    await set_file_processing(case, file["name"], {
+        "status": FileProcessingStatus.DONE, "processed_at": datetime.utcnow(), **results
+    })
+    if terms:
+        # Document text becomes searchable alongside the title and description
+        await cases_collection.update_one(
+            {"id": payload["case_id"]},
+            {"$addToSet": {"search_terms": {"$each": terms}}}
+        )
+    return {"terms": len(terms)}
+
+# Admin statistics rollups: one "totals" document with case/appointment
+# counters plus one "revenue" document per appointment month, all maintained
+# with $inc on the write paths and rebuildable from scratch
+STATS_TOTALS_ID = "totals"
+
+def month_key(value: datetime) -> str:
+    # Same UTC bucketing as $dateToString in rebuild_stats()
+    return naive_utc(value).strftime("%Y-%m")
+
+async def bump_stats(inc: dict, revenue_month: Optional[str] = None, revenue_inc: Optional[dict] = None):
+    # Rollups are best effort on the write path; rebuild_stats() repairs drift
+    try:
+        if inc:
+            await stats_collection.update_one({"_id": STATS_TOTALS_ID}, {"$inc": inc}, upsert=True)
+        if revenue_month:
+            await stats_collection.update_one(
+                {"_id": f"revenue:{revenue_month}"},
+                {"$inc": revenue_inc, "$set": {"kind": "revenue", "month": revenue_month}},
+                upsert=True
+            )
+    except Exception as e:
+        print(f"Failed to update stats rollups: {e}")
+
+async def record_case_created(case_type: CaseType):
+    await bump_stats({
+        "cases_total": 1,
+        f"cases_by_status.{CaseStatus.PENDING.value}": 1,
+        f"cases_by_type.{CaseType(case_type).value}": 1
+    })
+
+async def record_case_status_changes(changes: List[tuple]):
+    # changes: (old_status, new_status) pairs, folded into one $inc
+    inc = {}
+    for old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        old_key = f"cases_by_status.{CaseStatus(old_status).value}"
+        new_key = f"cases_by_status.{CaseStatus(new_status).value}"
+        inc[old_key] = inc.get(old_key, 0) - 1
+        inc[new_key] = inc.get(new_key, 0) + 1
+    inc = {key: value for key, value in inc.items() if value}
+    if inc:
+        await bump_stats(inc)
+
+async def record_case_status_change(old_status: str, new_status: str):
+    await record_case_status_changes([(old_status, new_status)])
+
+async def record_appointment_created(appointment_date: datetime, amount: float):
+    await bump_stats(
+        {"appointments_total": 1, f"appointments_by_status.{AppointmentStatus.PENDING.value}": 1},
+        revenue_month=month_key(appointment_date),
+        revenue_inc={"amount": amount, "appointments": 1}
+    )
+
+async def rebuild_stats() -> dict:
+    totals = {
+        "_id": STATS_TOTALS_ID,
+        "cases_total": 0,
+        "cases_by_status": {},
+        "cases_by_type": {},
+        "appointments_total": 0,
+        "appointments_by_status": {}
+    }
+    
+    async for row in cases_collection.aggregate([
+        {"$group": {"_id": {"status": "$status", "case_type": "$case_type"}, "count": {"$sum": 1}}}
+    ]):
+        status, case_type = row["_id"]["status"], row["_id"]["case_type"]
+        totals["cases_total"] += row["count"]
+        totals["cases_by_status"][status] = totals["cases_by_status"].get(status, 0) + row["count"]
+        totals["cases_by_type"][case_type] = totals["cases_by_type"].get(case_type, 0) + row["count"]
+    
+    async for row in appointments_collection.aggregate([
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]):
+        totals["appointments_total"] += row["count"]
+        totals["appointments_by_status"][row["_id"]] = row["count"]
+    
+    revenue = []
+    async for row in appointments_collection.aggregate([
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m", "date": "$appointment_date"}},
+            "amount": {"$sum": "$amount"},
+            "appointments": {"$sum": 1}
+        }}
+    ]):
+        revenue.append({
+            "_id": f"revenue:{row['_id']}",
+            "kind": "revenue",
+            "month": row["_id"],
+            "amount": row["amount"],
+            "appointments": row["appointments"]
+        })
+    
+    await stats_collection.replace_one({"_id": STATS_TOTALS_ID}, totals, upsert=True)
+    await stats_collection.delete_many({"kind": "revenue"})
+    if revenue:
+        await stats_collection.insert_many(revenue)
+    
+    return {"cases_total": totals["cases_total"], "appointments_total": totals["appointments_total"], "months": len(revenue)}
+
+# Case search: title and description are normalized into search_terms on
+# each case (indexed, multikey) so prefix lookups work across workers; the
+# matching candidates are then ranked in-process
+ARABIC_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+ARABIC_LETTER_MAP = str.maketrans({
+    "\u0623": "\u0627", "\u0625": "\u0627", "\u0622": "\u0627", "\u0671": "\u0627",  # alef variants
+    "\u0649": "\u064a",  # alef maksura -> ya
+    "\u0629": "\u0647",  # ta marbuta -> ha
+    "\u0624": "\u0648",  # waw with hamza
+    "\u0626": "\u064a",  # ya with hamza
+})
+TOKEN_PATTERN = re.compile(r"\w+")
+ARABIC_ARTICLE = "\u0627\u0644"
+
+def normalize_text(text: str) -> str:
+    text = ARABIC_DIACRITICS.sub("", text).translate(ARABIC_LETTER_MAP)
+    # Latin accents (French) are folded away; Arabic letters are unaffected
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(normalize_text(text or "")):
+        if len(token) < 2:
+            continue
+        tokens.append(token)
+        # Index Arabic words with and without the definite article
+        if token.startswith(ARABIC_ARTICLE) and len(token) > 3:
+            tokens.append(token[2:])
+    return tokens
+
+def search_terms(title: str, description: str) -> List[str]:
+    return sorted(set(tokenize(title)) | set(tokenize(description)))
+
+def search_score(query_terms: List[str], case: dict) -> float:
+    title_terms = set(tokenize(case["title"]))
+    description_terms = set(tokenize(case["description"]))
+    score = 0.0
+    for term in query_terms:
+        for terms, weight in ((title_terms, SEARCH_TITLE_WEIGHT), (description_terms, 1.0)):
+            if term in terms:
+                score += weight
+            elif any(t.startswith(term) for t in terms):
+                # Prefix matches rank below whole-word matches
+                score += weight * 0.5
+    return score
+
+async def backfill_search_terms() -> int:
+    updated = 0
+    operations = []
+    async for case in cases_collection.find(
+        {"search_terms": {"$exists": False}},
+        {"_id": 0, "id": 1, "title": 1, "description": 1}
+    ):
+        operations.append(UpdateOne(
+            {"id": case["id"]},
+            {"$set": {"search_terms": search_terms(case["title"], case["description"])}}
+        ))
+        if len(operations) >= EXPORT_BATCH_SIZE:
+            await cases_collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+    if operations:
+        await cases_collection.bulk_write(operations, ordered=False)
+        updated += len(operations)
+    return updated
+
+# Appointment slots: each booking claims its slot start in
+# appointment_slots (unique index), which makes reservation atomic across
+# requests and workers
+ACTIVE_APPOINTMENT_STATUSES = [AppointmentStatus.PENDING, AppointmentStatus.CONFIRMED, AppointmentStatus.COMPLETED]
+
+def office_time(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        return value.astimezone(OFFICE_TIMEZONE).replace(tzinfo=None)
+    return value
+
+def office_now() -> datetime:
+    return datetime.now(OFFICE_TIMEZONE).replace(tzinfo=None)
+
+def day_slots(day: date) -> List[datetime]:
+    if day.weekday() not in OFFICE_DAYS:
+        return []
+    slot = timedelta(minutes=APPOINTMENT_SLOT_MINUTES)
+    start = datetime.combine(day, OFFICE_OPEN)
+    close = datetime.combine(day, OFFICE_CLOSE)
+    slots = []
+    while start + slot <= close:
+        slots.append(start)
+        start += slot
+    return slots
+
+def is_slot_start(value: datetime) -> bool:
+    return value in day_slots(value.date())
+
+class BookingIndex:
+    """Sorted interval index over bookings in a time range.
+
+    Every booking is [start, start + slot length); overlap tests are a
+    bisect into the sorted starts.
+    """
+
+    def __init__(self, starts: List[datetime]):
+        self.starts = sorted(starts)
+        self.length = timedelta(minutes=APPOINTMENT_SLOT_MINUTES)
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        # Bookings starting before `end` and ending after `start`
+        i = bisect.bisect_left(self.starts, start - self.length + timedelta(microseconds=1))
+        return i < len(self.starts) and self.starts[i] < end
+
+async def load_booking_index(range_start: datetime, range_end: datetime) -> BookingIndex:
+    # Appointments booked before slots existed may start off the grid, so
+    # bookings are read from appointments rather than from slot claims
+    length = timedelta(minutes=APPOINTMENT_SLOT_MINUTES)
+    starts = [
+        office_time(a["appointment_date"])
+        async for a in appointments_collection.find(
+            {
+                "appointment_date": {"$gt": range_start - length, "$lt": range_end},
+                "status": {"$in": ACTIVE_APPOINTMENT_STATUSES}
+            },
+            {"_id": 0, "appointment_date": 1}
+        )
+    ]
+    return BookingIndex(starts)
+
+async def reserve_slot(start: datetime, appointment_id: str):
+    end = start + timedelta(minutes=APPOINTMENT_SLOT_MINUTES)
+    if (await load_booking_index(start, end)).overlaps(start, end):
+        raise HTTPException(status_code=409, detail="This time slot is already booked")
+    
+    claim = {"start": start, "appointment_id": appointment_id, "created_at": datetime.utcnow()}
+    try:
+        await appointment_slots_collection.insert_one(claim)
+        return
+    except DuplicateKeyError:
+        pass
+    
+    # The slot is claimed; take it over only if the holder was cancelled, or
+    # if its appointment never got inserted. A missing appointment may still
+    # be on its way from the request that made the claim, so that case waits
+    # out the grace period.
+    existing = await appointment_slots_collection.find_one(
+        {"start": start}, {"_id": 0, "appointment_id": 1, "created_at": 1}
+    )
+    if existing:
+        holder = await appointments_collection.find_one({"id": existing["appointment_id"]}, {"_id": 0, "status": 1})
+        if holder is None:
+            abandoned = existing["created_at"] < claim["created_at"] - timedelta(seconds=APPOINTMENT_SLOT_CLAIM_GRACE_SECONDS)
+        else:
+            abandoned = holder["status"] not in ACTIVE_APPOINTMENT_STATUSES
+        if abandoned:
+            result = await appointment_slots_collection.update_one(
+                {"start": start, "appointment_id": existing["appointment_id"]},
+                {"$set": {"appointment_id": appointment_id, "created_at": claim["created_at"]}}
+            )
+            if result.modified_count:
+                return
+    raise HTTPException(status_code=409, detail="This time slot is already booked")
+
+async def release_slot(start: datetime, appointment_id: str):
+    await appointment_slots_collection.delete_one({"start": start, "appointment_id": appointment_id})
+
+class MemoryRateLimitBackend:
+    """Token buckets in an LRU; buckets that have refilled are dropped."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, capacity: int, refill_seconds: float) -> float:
+        now = time.monotonic()
+        rate = capacity / refill_seconds
+        
+        # Evict idle keys from the cold end; a full bucket carries no state
+        while self._buckets:
+            oldest = next(iter(self._buckets.values()))
+            if oldest[2] > now and len(self._buckets) < self.max_keys:
+                break
+            self._buckets.popitem(last=False)
+        
+        tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+        
+        self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        self._buckets.move_to_end(key)
+        return retry_after
+
+class SQLiteRateLimitBackend:
+    """Token buckets in a local SQLite file shared by all workers on a host."""
+
+    def __init__(self, path: str, max_keys: int):
+        self.path = path
+        self.max_keys = max_keys
+        self._conn = None
+        self._lock = threading.Lock()
+        self._takes = 0
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL, updated REAL, full_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_full_at ON buckets (full_at)")
+        return self._conn
+
+    def _take(self, key: str, capacity: int, refill_seconds: float) -> float:
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            rate = capacity / refill_seconds
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated = row if row else (capacity, now)
+                tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+                retry_after = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    retry_after = (1 - tokens) / rate
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)",
+                    (key, tokens, now, now + (capacity - tokens) / rate)
+                )
+                
+                self._takes += 1
+                if self._takes % 1000 == 0:
+                    conn.execute("DELETE FROM buckets WHERE full_at <= ?", (now,))
+                    conn.execute(
+                        "DELETE FROM buckets WHERE key IN "
+                        "(SELECT key FROM buckets ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+                        (self.max_keys,)
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return retry_after
+
+    async def take(self, key: str, capacity: int, refill_seconds: float) -> float:
+        return await asyncio.to_thread(self._take, key, capacity, refill_seconds)
+
+def create_rate_limit_backend():
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteRateLimitBackend(RATE_LIMIT_SQLITE_PATH, RATE_LIMIT_MAX_KEYS)
+    return MemoryRateLimitBackend(RATE_LIMIT_MAX_KEYS)
+
+rate_limit_backend = create_rate_limit_backend()
+
+# Response cache. Entries are serialized response bodies tagged with what
+# they were built from ("cases:<user id>", "case:<case id>",
+# "appointments:<user id>"); write paths invalidate by tag. A put is dropped
+# if one of its tags was invalidated while the response was being built, so
+# a slow read can't re-cache data a concurrent write just replaced.
+class MemoryResponseCache:
+    """LRU bounded by total body bytes, with a tag index for invalidation."""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tags = {}
+        self.bytes = 0
+        self.seq = 0
+        self._recent = deque(maxlen=10000)
+
+    async def ticket(self) -> int:
+        return self.seq
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        body, tags, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return body
+
+    async def put(self, key: str, tags: List[str], body: bytes, ticket: int):
+        if self._invalidated_since(ticket, tags) or len(body) > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (body, tags, time.monotonic() + self.ttl)
+        self.bytes += len(key) + len(body)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    async def invalidate(self, tags: List[str]):
+        for tag in tags:
+            self.seq += 1
+            self._recent.append((self.seq, tag))
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def _invalidated_since(self, ticket: int, tags: List[str]) -> bool:
+        if ticket == self.seq:
+            return False
+        # Too many invalidations to tell; don't cache
+        if self.seq - ticket > len(self._recent):
+            return True
+        for seq, tag in reversed(self._recent):
+            if seq <= ticket:
+                return False
+            if tag in tags:
+                return True
+        return False
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        body, tags, _ = entry
+        self.bytes -= len(key) + len(body)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "entries": len(self._entries), "bytes": self.bytes}
+
+class SQLiteResponseCache:
+    """Response cache in a local SQLite file shared by all workers on a host."""
+
+    def __init__(self, path: str, max_bytes: int, ttl: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._conn = None
+        self._lock = threading.Lock()
+        self._puts = 0
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, body BLOB, size INTEGER, expires_at REAL, used_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS response_tags (tag TEXT, key TEXT)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS response_tags_tag ON response_tags (tag)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS response_tags_key ON response_tags (key)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_invalidations "
+                "(seq INTEGER PRIMARY KEY AUTOINCREMENT, tag TEXT, at REAL)"
+            )
+        return self._conn
+
+    def _ticket(self) -> int:
+        with self._lock:
+            row = self._connect().execute("SELECT MAX(seq) FROM response_invalidations").fetchone()
+            return row[0] or 0
+
+    def _get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            row = conn.execute("SELECT body, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                return None
+            conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def _delete_keys(self, conn, keys: list):
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            conn.execute(f"DELETE FROM responses WHERE key IN ({marks})", chunk)
+            conn.execute(f"DELETE FROM response_tags WHERE key IN ({marks})", chunk)
+
+    def _put(self, key: str, tags: List[str], body: bytes, ticket: int):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                marks = ",".join("?" * len(tags))
+                stale = conn.execute(
+                    f"SELECT 1 FROM response_invalidations WHERE seq > ? AND tag IN ({marks}) LIMIT 1",
+                    (ticket, *tags)
+                ).fetchone()
+                if stale is None:
+                    self._delete_keys(conn, [key])
+                    conn.execute(
+                        "INSERT INTO responses (key, body, size, expires_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                        (key, body, len(key) + len(body), now + self.ttl, now)
+                    )
+                    conn.executemany("INSERT INTO response_tags (tag, key) VALUES (?, ?)", [(t, key) for t in tags])
+                    
+                    self._puts += 1
+                    if self._puts % 100 == 0:
+                        self._evict(conn, now)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, conn, now: float):
+        expired = [row[0] for row in conn.execute("SELECT key FROM responses WHERE expires_at <= ?", (now,))]
+        self._delete_keys(conn, expired)
+        excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0] - self.max_bytes
+        if excess > 0:
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY used_at"):
+                victims.append(key)
+                excess -= size
+                if excess <= 0:
+                    break
+            self._delete_keys(conn, victims)
+        # Invalidations only matter to puts that started before them
+        conn.execute("DELETE FROM response_invalidations WHERE at < ?", (now - 3600,))
+
+    def _invalidate(self, tags: List[str]):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO response_invalidations (tag, at) VALUES (?, ?)", [(t, time.time()) for t in tags]
+                )
+                marks = ",".join("?" * len(tags))
+                keys = [row[0] for row in conn.execute(
+                    f"SELECT DISTINCT key FROM response_tags WHERE tag IN ({marks})", tags
+                )]
+                self._delete_keys(conn, keys)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def ticket(self) -> int:
+        return await asyncio.to_thread(self._ticket)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def put(self, key: str, tags: List[str], body: bytes, ticket: int):
+        await asyncio.to_thread(self._put, key, tags, body, ticket)
+
+    async def invalidate(self, tags: List[str]):
+        await asyncio.to_thread(self._invalidate, tags)
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", "path": self.path}
+
+def create_response_cache():
+    if RESPONSE_CACHE_BACKEND == "off":
+        return None
+    if RESPONSE_CACHE_BACKEND == "sqlite":
+        return SQLiteResponseCache(RESPONSE_CACHE_SQLITE_PATH, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL_SECONDS)
+    return MemoryResponseCache(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL_SECONDS)
+
+response_cache = create_response_cache()
+
+async def cached_response(request: Request, user_id: str, tags: List[str], build) -> Response:
+    # Serves the user's cached body for this path and query, or builds the
+    # response with build() and caches it when it is a 200
+    if response_cache is None:
+        return await build()
+    
+    route = request.scope["route"].path
+    key = f"{user_id}:{request.url.path}?{urlencode(sorted(request.query_params.multi_items()))}"
+    body = await response_cache.get(key)
+    if body is not None:
+        RESPONSE_CACHE_REQUESTS.inc(route=route, result="hit")
+        return Response(content=body, media_type="application/json", headers={"X-Cache": "HIT"})
+    
+    RESPONSE_CACHE_REQUESTS.inc(route=route, result="miss")
+    ticket = await response_cache.ticket()
+    response = await build()
+    if response.status_code == 200:
+        await response_cache.put(key, tags, response.body, ticket)
+    response.headers["X-Cache"] = "MISS"
+    return response
+
+async def invalidate_responses(tags):
+    if response_cache is not None and tags:
+        await response_cache.invalidate(sorted(set(tags)))
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+async def enforce_auth_rate_limit(request: Request, email: str):
+    for key, (capacity, refill_seconds) in (
+        (f"auth:ip:{client_ip(request)}", AUTH_RATE_LIMIT_PER_IP),
+        (f"auth:email:{email.lower()}", AUTH_RATE_LIMIT_PER_EMAIL),
+    ):
+        retry_after = await rate_limit_backend.take(key, capacity, refill_seconds)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many attempts, please try again later",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+PASSWORD_POOL_PENDING = metrics.register(Gauge(
+    "password_pool_pending", "Password jobs running or queued"
+))
+PASSWORD_POOL_REJECTED = metrics.register(CollectedCounter(
+    "password_pool_rejected_total", "Password jobs shed because the pool was full"
+))
+PRINCIPAL_CACHE_LOOKUPS = metrics.register(CollectedCounter(
+    "principal_cache_lookups_total", "Principal cache lookups", ("result",)
+))
+VIDEO_VIEWS_BUFFERED = metrics.register(Gauge(
+    "video_views_buffered", "Video views waiting to be flushed"
+))
+RESPONSE_CACHE_ENTRIES = metrics.register(Gauge(
+    "response_cache_entries", "Responses held in this worker's memory cache"
+))
+RESPONSE_CACHE_BYTES = metrics.register(Gauge(
+    "response_cache_bytes", "Bytes held in this worker's memory cache"
+))
+CASE_EVENT_SUBSCRIBERS = metrics.register(Gauge(
+    "case_event_subscribers", "Open case status event streams"
+))
+CASE_EVENTS_LAGGED = metrics.register(CollectedCounter(
+    "case_events_lagged_total", "Event streams that overflowed their buffer and were resynced"
+))
+
+def collect_component_metrics():
+    PASSWORD_POOL_PENDING.set(password_pool.pending)
+    PASSWORD_POOL_REJECTED.set(password_pool.rejected)
+    PRINCIPAL_CACHE_LOOKUPS.set(principal_cache.hits, result="hit")
+    PRINCIPAL_CACHE_LOOKUPS.set(principal_cache.misses, result="miss")
+    VIDEO_VIEWS_BUFFERED.set(sum(view_counter.pending.values()))
+    if isinstance(response_cache, MemoryResponseCache):
+        RESPONSE_CACHE_ENTRIES.set(len(response_cache._entries))
+        RESPONSE_CACHE_BYTES.set(response_cache.bytes)
+    stats = case_events.stats()
+    CASE_EVENT_SUBSCRIBERS.set(stats["subscribers"])
+    CASE_EVENTS_LAGGED.set(stats["lagged"])
+
+metrics.collectors.append(collect_component_metrics)
+
+# Routes
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/")
+async def root():
+    return {"message": "Union Law Firm API is running"}
+
+@app.post("/api/auth/register")
+async def register(user: UserCreate, request: Request):
+    await enforce_auth_rate_limit(request, user.email)
+    
+    # Check if user already exists
+    existing_user = await users_collection.find_one({"email": user.email}, {"_id": 1})
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    # Create new user
+    user_id = str(uuid.uuid4())
+    hashed_password = await hash_password_async(user.password)
+    
+    user_data = {
+        "id": user_id,
+        "email": user.email,
+        "password": hashed_password,
+        "name": user.name,
+        "role": UserRole.CLIENT,
+        "phone": user.phone,
+        "token_version": 0,
+        "created_at": datetime.utcnow()
+    }
+    
+    await users_collection.insert_one(user_data)
+    
+    # Create access token
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data=token_claims(user_data), expires_delta=access_token_expires
+    )
+    
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": {
+            "id": user_id,
+            "email": user.email,
+            "name": user.name,
+            "role": UserRole.CLIENT
+        }
+    }
+
+@app.post("/api/auth/login")
+async def login(user: UserLogin, request: Request):
+    await enforce_auth_rate_limit(request, user.email)
+    
+    db_user = await users_collection.find_one(
+        {"email": user.email},
+        {"_id": 0, "id": 1, "email": 1, "name": 1, "role": 1, "password": 1, "token_version": 1}
+    )
+    if not db_user or not await verify_password_async(user.password, db_user["password"]):
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data=token_claims(db_user), expires_delta=access_token_expires
+    )
+    
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": {
+            "id": db_user["id"],
+            "email": db_user["email"],
+            "name": db_user["name"],
+            "role": db_user["role"]
+        }
+    }
+
+@app.get("/api/auth/me")
+async def get_current_user_info(current_user: User = Depends(get_current_user)):
+    return current_user
+
+@app.get("/api/me/dashboard")
+async def get_dashboard(
+    cases_limit: int = Query(DASHBOARD_CASES_LIMIT[0], ge=0, le=DASHBOARD_CASES_LIMIT[1]),
+    appointments_limit: int = Query(DASHBOARD_APPOINTMENTS_LIMIT[0], ge=0, le=DASHBOARD_APPOINTMENTS_LIMIT[1]),
+    videos_limit: int = Query(DASHBOARD_VIDEOS_LIMIT[0], ge=0, le=DASHBOARD_VIDEOS_LIMIT[1]),
+    appointments: DashboardAppointments = DashboardAppointments.UPCOMING,
+    current_user: User = Depends(get_current_user)
+):
+    # Everything the client dashboard shows, for one authentication and with
+    # the independent reads running concurrently
+    async def recent_cases():
+        if cases_limit == 0:
+            return [], None
+        docs, next_cursor = await fetch_page(
+            cases_collection, {"user_id": current_user.id}, None, SortOrder.DESC, cases_limit, CASE_FIELDS
+        )
+        return [normalize_case(case) for case in docs], next_cursor
+    
+    async def user_appointments():
+        if appointments_limit == 0:
+            return [], None
+        if appointments == DashboardAppointments.ALL:
+            # Full history, first page of /api/appointments (same cursor)
+            docs, next_cursor = await fetch_page(
+                appointments_collection, {"user_id": current_user.id}, None, SortOrder.DESC,
+                appointments_limit, APPOINTMENT_FIELDS
+            )
+        else:
+            docs = await appointments_collection.find(
+                {
+                    "user_id": current_user.id,
+                    "appointment_date": {"$gte": office_now()},
+                    "status": {"$ne": AppointmentStatus.CANCELLED}
+                },
+                APPOINTMENT_FIELDS
+            ).sort("appointment_date", ASCENDING).limit(appointments_limit).to_list(appointments_limit)
+            next_cursor = None
+        for appointment in docs:
+            appointment.setdefault("notes", None)
+        return docs, next_cursor
+    
+    async def featured_videos():
+        if videos_limit == 0:
+            return []
+        # Most viewed, straight from the in-memory catalogue
+        await video_catalogue.load()
+        views = {v["id"]: video_catalogue.current_views(v) for v in video_catalogue.videos}
+        top = sorted(video_catalogue.videos, key=lambda v: views[v["id"]], reverse=True)[:videos_limit]
+        return [{**video, "views": views[video["id"]]} for video in top]
+    
+    (cases, cases_cursor), (appointment_docs, appointments_cursor), videos = await asyncio.gather(
+        recent_cases(), user_appointments(), featured_videos()
+    )
+    
+    return ORJSONResponse({
+        "user": current_user.model_dump(),
+        "cases": {"items": cases, "next_cursor": cases_cursor},
+        "appointments": {"items": appointment_docs, "next_cursor": appointments_cursor},
+        "videos": {"items": videos}
+    })
+
+@app.post("/api/cases")
+async def create_case(
+    case_type: CaseType = Form(...),
+    title: str = Form(...),
+    description: str = Form(...),
+    files: List[UploadFile] = File(default=[]),
+    upload_ids: List[str] = Form(default=[]),
+    current_user: User = Depends(get_current_user)
+):
+    # Save uploaded files; duplicates of stored content only add a reference
+    saved_files = await save_uploads(files)
+    attached_files = await claim_uploads(upload_ids, current_user.id)
+    queue_file_processing(saved_files + attached_files)
+    
+    # Create case
+    case_id = str(uuid.uuid4())
+    case_data = {
+        "id": case_id,
+        "user_id": current_user.id,
+        "case_type": case_type,
+        "title": title,
+        "description": description,
+        "status": CaseStatus.PENDING,
+        "files": saved_files + attached_files,
+        "search_terms": search_terms(title, description),
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+    
+    # References are taken before the case exists so the collector can never
+    # reclaim a blob a case points at; a failed insert gives them back
+    await retain_blobs(saved_files)
+    try:
+        await cases_collection.insert_one(case_data)
+    except Exception:
+        await release_blobs(saved_files)
+        await unclaim_uploads(upload_ids)
+        raise
+    
+    await record_case_created(case_type)
+    await invalidate_responses([f"cases:{current_user.id}"])
+    await enqueue_file_processing(case_id, saved_files + attached_files)
+    
+    return {
+        "message": "Case submitted successfully",
+        "case_id": case_id,
+        "status": CaseStatus.PENDING
+    }
+
+# Resumable uploads (tus-style)
+@app.post("/api/uploads")
+async def create_upload(request: Request, current_user: User = Depends(get_current_user)):
+    try:
+        length = int(request.headers["Upload-Length"])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Upload-Length header is required")
+    if length < 0 or length > MAX_RESUMABLE_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Upload is too large")
+    
+    metadata = parse_upload_metadata(request.headers.get("Upload-Metadata"))
+    filename = metadata.get("filename") or "upload"
+    
+    upload_id = str(uuid.uuid4())
+    expires_at = datetime.utcnow() + timedelta(hours=UPLOAD_SESSION_EXPIRY_HOURS)
+    os.makedirs(UPLOAD_SESSION_DIR, exist_ok=True)
+    open(upload_session_path(upload_id), 'wb').close()
+    
+    await upload_sessions_collection.insert_one({
+        "id": upload_id,
+        "user_id": current_user.id,
+        "filename": filename,
+        "content_type": metadata.get("filetype") or mimetypes.guess_type(filename)[0],
+        "length": length,
+        "offset": 0,
+        "status": UploadSessionStatus.IN_PROGRESS,
+        "file": None,
+        "created_at": datetime.utcnow(),
+        "expires_at": expires_at
+    })
+    
+    return JSONResponse(
+        status_code=201,
+        content={"id": upload_id, "offset": 0, "length": length},
+        headers={
+            "Location": f"/api/uploads/{upload_id}",
+            "Tus-Resumable": TUS_VERSION,
+            "Upload-Expires": expires_at.isoformat()
+        }
+    )
+
+@app.head("/api/uploads/{upload_id}")
+async def get_upload_offset(upload_id: str, current_user: User = Depends(get_current_user)):
+    session = await get_upload_session(upload_id, current_user.id)
+    offset = session["offset"]
+    if session["status"] == UploadSessionStatus.IN_PROGRESS:
+        offset = await asyncio.to_thread(sync_session_file, upload_session_path(upload_id), offset)
+    
+    return Response(status_code=200, headers={
+        "Upload-Offset": str(offset),
+        "Upload-Length": str(session["length"]),
+        "Upload-Expires": session["expires_at"].isoformat(),
+        "Tus-Resumable": TUS_VERSION,
+        "Cache-Control": "no-store"
+    })
+
+@app.patch("/api/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request, current_user: User = Depends(get_current_user)):
+    if request.headers.get("Content-Type") != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Content-Type must be application/offset+octet-stream")
+    try:
+        client_offset = int(request.headers["Upload-Offset"])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Upload-Offset header is required")
+    
+    async with upload_session_lock(upload_id):
+        session = await get_upload_session(upload_id, current_user.id)
+        if session["status"] != UploadSessionStatus.IN_PROGRESS:
+            raise HTTPException(status_code=409, detail="Upload is already finalized")
+        
+        path = upload_session_path(upload_id)
+        offset = await asyncio.to_thread(sync_session_file, path, session["offset"])
+        if client_offset != offset:
+            raise HTTPException(status_code=409, detail="Upload-Offset does not match", headers={"Upload-Offset": str(offset)})
+        
+        # Whatever arrived is kept even if the client drops mid-chunk, so the
+        # next PATCH resumes from there
+        try:
+            async with aiofiles.open(path, 'ab') as partial:
+                async for chunk in request.stream():
+                    if offset + len(chunk) > session["length"]:
+                        raise HTTPException(status_code=413, detail="Chunk exceeds Upload-Length")
+                    await partial.write(chunk)
+                    offset += len(chunk)
+                    UPLOAD_BYTES.inc(len(chunk), source="resumable")
+        finally:
+            expires_at = datetime.utcnow() + timedelta(hours=UPLOAD_SESSION_EXPIRY_HOURS)
+            await upload_sessions_collection.update_one(
+                {"id": upload_id},
+                {"$set": {"offset": offset, "expires_at": expires_at}}
+            )
+    
+    return Response(status_code=204, headers={
+        "Upload-Offset": str(offset),
+        "Upload-Expires": expires_at.isoformat(),
+        "Tus-Resumable": TUS_VERSION
+    })
+
+@app.post("/api/uploads/{upload_id}/finalize")
+async def finalize_upload(
+    upload_id: str,
+    case_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    async with upload_session_lock(upload_id):
+        session = await get_upload_session(upload_id, current_user.id)
+        
+        if session["status"] == UploadSessionStatus.IN_PROGRESS:
+            if session["offset"] != session["length"]:
+                raise HTTPException(status_code=409, detail="Upload is not complete")
+            
+            path = upload_session_path(upload_id)
+            sha256 = await asyncio.to_thread(hash_file, path)
+            file_extension = os.path.splitext(session["filename"])[1]
+            file = {
+                "name": f"{uuid.uuid4()}{file_extension}",
+                "original_name": session["filename"],
+                "content_type": session["content_type"],
+                "size": session["length"],
+                "sha256": sha256,
+                "storage": "blob",
+                "uploaded_at": datetime.utcnow()
+            }
+            
+            # The session holds the blob reference until a case claims it
+            await asyncio.to_thread(commit_blob, path, sha256)
+            await retain_blobs([file])
+            await upload_sessions_collection.update_one(
+                {"id": upload_id},
+                {"$set": {"status": UploadSessionStatus.COMPLETED, "file": file}}
+            )
+            session.update(status=UploadSessionStatus.COMPLETED, file=file)
+    
+    if case_id and session["status"] == UploadSessionStatus.COMPLETED:
+        files = queue_file_processing(await claim_uploads([upload_id], current_user.id))
+        result = await cases_collection.update_one(
+            {"id": case_id, "user_id": current_user.id},
+            {"$push": {"files": {"$each": files}}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        if result.matched_count == 0:
+            await unclaim_uploads([upload_id])
+            raise HTTPException(status_code=404, detail="Case not found")
+        await invalidate_responses([f"cases:{current_user.id}", f"case:{case_id}"])
+        await enqueue_file_processing(case_id, files)
+        session["status"] = UploadSessionStatus.ATTACHED
+    
+    return {
+        "id": upload_id,
+        "status": session["status"],
+        "case_id": case_id if session["status"] == UploadSessionStatus.ATTACHED else None,
+        "file": session["file"]
+    }
+
+@app.get("/api/cases")
+async def get_user_cases(
+    request: Request,
+    status: Optional[CaseStatus] = None,
+    case_type: Optional[CaseType] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sort: SortOrder = SortOrder.DESC,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    current_user: User = Depends(get_current_user)
+):
+    async def build():
+        query = case_query(status, case_type, created_from, created_to, user_id=current_user.id)
+        
+        docs, next_cursor = await fetch_page(cases_collection, query, cursor, sort, limit, CASE_FIELDS)
+        for case in docs:
+            normalize_case(case)
+        
+        return ORJSONResponse({"items": docs, "next_cursor": next_cursor})
+    
+    return await cached_response(request, current_user.id, [f"cases:{current_user.id}"], build)
+
+@app.get("/api/cases/events")
+async def case_events_stream(
+    request: Request,
+    access_token: Optional[str] = Query(None, description="For EventSource clients, which cannot send headers")
+):
+    authorization = request.headers.get("Authorization", "")
+    token = authorization[7:] if authorization.startswith("Bearer ") else access_token
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    current_user = await authenticate(token)
+    expires_at = jwt.decode(token, options={"verify_signature": False}).get("exp", float("inf"))
+    
+    return StreamingResponse(
+        case_event_stream(current_user.id, request.headers.get("Last-Event-ID"), expires_at),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/cases/{case_id}")
+async def get_case(case_id: str, request: Request, current_user: User = Depends(get_current_user)):
+    async def build():
+        case = await cases_collection.find_one(case_access_query(case_id, current_user), CASE_FIELDS)
+        if not case:
+            raise HTTPException(status_code=404, detail="Case not found")
+        
+        return ORJSONResponse(normalize_case(case))
+    
+    return await cached_response(request, current_user.id, [f"case:{case_id}"], build)
+
+@app.get("/api/cases/{case_id}/files/{name}")
+async def download_case_file(
+    case_id: str,
+    name: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    # Same ownership rule as get_case, but only the files array is read
+    case = await cases_collection.find_one(case_access_query(case_id, current_user), {"_id": 0, "files": 1})
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+    
+    file = next((f for f in case_files(case) if f["name"] == name), None)
+    if file is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    scan = (file.get("processing") or {}).get("scan") or {}
+    if scan.get("infected") and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="File failed the malware scan")
+    
+    return file_response(request, file)
+
+@app.post("/api/appointments")
+async def create_appointment(
+    appointment: AppointmentCreate,
+    current_user: User = Depends(get_current_user)
+):
+    appointment_date = office_time(appointment.appointment_date)
+    if not is_slot_start(appointment_date):
+        raise HTTPException(status_code=400, detail="Requested time is not a bookable slot")
+    if appointment_date < office_now():
+        raise HTTPException(status_code=400, detail="Requested time is in the past")
+    
+    appointment_id = str(uuid.uuid4())
+    await reserve_slot(appointment_date, appointment_id)
+    
+    appointment_data = {
+        "id": appointment_id,
+        "user_id": current_user.id,
+        "appointment_date": appointment_date,
+        "status": AppointmentStatus.PENDING,
+        "payment_status": "pending",
+        "amount": 100.0,  # Default consultation fee
+        "notes": appointment.notes,
+        "created_at": datetime.utcnow()
+    }
+    
+    try:
+        await appointments_collection.insert_one(appointment_data)
+    except Exception:
+        await release_slot(appointment_date, appointment_id)
+        raise
+    await record_appointment_created(appointment_date, appointment_data["amount"])
+    await invalidate_responses([f"appointments:{current_user.id}"])
+    
+    return {
+        "message": "Appointment scheduled successfully",
+        "appointment_id": appointment_id,
+        "status": AppointmentStatus.PENDING
+    }
+
+@app.get("/api/appointments/availability")
+async def get_appointment_availability(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to")
+):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (date_to - date_from).days >= AVAILABILITY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {AVAILABILITY_MAX_DAYS} days")
+    
+    range_start = datetime.combine(date_from, dt_time.min)
+    range_end = datetime.combine(date_to + timedelta(days=1), dt_time.min)
+    bookings = await load_booking_index(range_start, range_end)
+    now = office_now()
+    length = timedelta(minutes=APPOINTMENT_SLOT_MINUTES)
+    
+    days = []
+    day = date_from
+    while day <= date_to:
+        free = [
+            start for start in day_slots(day)
+            if start >= now and not bookings.overlaps(start, start + length)
+        ]
+        if free:
+            days.append({"date": day, "slots": free})
+        day += timedelta(days=1)
+    
+    return ORJSONResponse({
+        "timezone": str(OFFICE_TIMEZONE),
+        "slot_minutes": APPOINTMENT_SLOT_MINUTES,
+        "days": days
+    })
+
+@app.get("/api/appointments")
+async def get_user_appointments(
+    request: Request,
+    status: Optional[AppointmentStatus] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sort: SortOrder = SortOrder.DESC,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    current_user: User = Depends(get_current_user)
+):
+    async def build():
+        query = appointment_query(status, created_from, created_to, user_id=current_user.id)
+        
+        docs, next_cursor = await fetch_page(appointments_collection, query, cursor, sort, limit, APPOINTMENT_FIELDS)
+        for appointment in docs:
+            appointment.setdefault("notes", None)
+        
+        return ORJSONResponse({"items": docs, "next_cursor": next_cursor})
+    
+    return await cached_response(request, current_user.id, [f"appointments:{current_user.id}"], build)
 
 @app.get("/api/videos")
-async def get_videos():
-    videos = []
-    async for video in videos_collection.find():
-        videos.append({
-            "id": video["id"],
-            "title": video["title"],
-            "description": video["description"],
-            "video_url": video["video_url"],
-            "thumbnail_url": video["thumbnail_url"],
-            "category": video["category"],
-            "duration": video["duration"],
-            "views": video["views"],
-            "created_at": video["created_at"]
-        })
+async def get_videos(
+    request: Request,
+    category: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sort: SortOrder = SortOrder.DESC,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT)
+):
+    body, etag = await video_catalogue.page(category, created_from, created_to, sort, cursor, limit)
     
-    return videos
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=0, must-revalidate"}
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.get("/api/videos/{video_id}")
 async def get_video(video_id: str):
-    video = await videos_collection.find_one({"id": video_id})
+    video = await video_catalogue.get(video_id)
     if not video:
-        raise HTTPException(status_code=404, detail="Video not found")
+        # Added since the catalogue was loaded?
+        if not await videos_collection.find_one({"id": video_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Video not found")
+        invalidate_video_catalogue()
+        video = await video_catalogue.get(video_id)
+        if not video:
+            raise HTTPException(status_code=404, detail="Video not found")
     
-    # Increment views
-    await videos_collection.update_one(
-        {"id": video_id},
-        {"$inc": {"views": 1}}
-    )
+    # Increment views; the write is coalesced by the view counter
+    view_counter.record(video_id)
     
-    return {
-        "id": video["id"],
-        "title": video["title"],
-        "description": video["description"],
-        "video_url": video["video_url"],
-        "thumbnail_url": video["thumbnail_url"],
-        "category": video["category"],
-        "duration": video["duration"],
-        "views": video["views"] + 1,
-        "created_at": video["created_at"]
-    }
+    return {**video, "views": video_catalogue.current_views(video)}
 
 # Admin routes
 @app.get("/api/admin/cases")
-async def get_all_cases(current_user: User = Depends(get_current_user)):
+async def get_all_cases(
+    status: Optional[CaseStatus] = None,
+    case_type: Optional[CaseType] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sort: SortOrder = SortOrder.DESC,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    current_user: User = Depends(get_current_user)
+):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    cases = []
-    async for case in cases_collection.find():
-        # Get user info
-        user = await users_collection.find_one({"id": case["user_id"]})
-        cases.append({
-            "id": case["id"],
-            "user_name": user["name"] if user else "Unknown",
-            "user_email": user["email"] if user else "Unknown",
-            "case_type": case["case_type"],
-            "title": case["title"],
-            "description": case["description"],
-            "status": case["status"],
-            "files": case["files"],
-            "created_at": case["created_at"],
-            "updated_at": case["updated_at"]
-        })
+    query = case_query(status, case_type, created_from, created_to)
+    
+    docs, next_cursor = await fetch_page(cases_collection, query, cursor, sort, limit, ADMIN_CASE_FIELDS)
+    users = await resolve_users(docs)
+    
+    for case in docs:
+        user = users.get(case.pop("user_id"))
+        case["user_name"] = user["name"] if user else "Unknown"
+        case["user_email"] = user["email"] if user else "Unknown"
+        normalize_case(case)
+    
+    return ORJSONResponse({"items": docs, "next_cursor": next_cursor})
+
+@app.get("/api/admin/cases/search")
+async def search_cases(
+    q: str = Query(..., min_length=1),
+    status: Optional[CaseStatus] = None,
+    case_type: Optional[CaseType] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_LIMIT),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    query_terms = list(dict.fromkeys(tokenize(q)))
+    if not query_terms:
+        return {"items": [], "total_candidates": 0}
+    
+    # Every query term must prefix-match one of the case's terms
+    query = case_query(status, case_type)
+    query["$and"] = [
+        {"search_terms": {"$elemMatch": {"$gte": term, "$lt": term + "\uffff"}}}
+        for term in query_terms
+    ]
+    candidates = await cases_collection.find(query, ADMIN_CASE_FIELDS).limit(
+        SEARCH_CANDIDATE_LIMIT
+    ).to_list(SEARCH_CANDIDATE_LIMIT)
+    
+    for case in candidates:
+        case["score"] = search_score(query_terms, case)
+    candidates.sort(key=lambda c: (c["score"], c["updated_at"]), reverse=True)
+    results = candidates[:limit]
+    
+    users = await resolve_users(results)
+    for case in results:
+        user = users.get(case.pop("user_id"))
+        case["user_name"] = user["name"] if user else "Unknown"
+        case["user_email"] = user["email"] if user else "Unknown"
+        normalize_case(case)
+    
+    return ORJSONResponse({"items": results, "total_candidates": len(candidates)})
+
+@app.get("/api/admin/stats")
+async def get_admin_stats(months: int = Query(12, ge=1, le=120), current_user: User = Depends(get_current_user)):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    totals = await stats_collection.find_one({"_id": STATS_TOTALS_ID}) or {}
+    revenue = await stats_collection.find(
+        {"kind": "revenue"},
+        {"_id": 0, "month": 1, "amount": 1, "appointments": 1}
+    ).sort("month", DESCENDING).limit(months).to_list(months)
+    
+    cases_by_status = totals.get("cases_by_status", {})
+    cases_by_type = totals.get("cases_by_type", {})
+    appointments_by_status = totals.get("appointments_by_status", {})
+    
+    return {
+        "cases": {
+            "total": totals.get("cases_total", 0),
+            "by_status": {s.value: cases_by_status.get(s.value, 0) for s in CaseStatus},
+            "by_type": {t.value: cases_by_type.get(t.value, 0) for t in CaseType}
+        },
+        "appointments": {
+            "total": totals.get("appointments_total", 0),
+            "pending": appointments_by_status.get(AppointmentStatus.PENDING.value, 0),
+            "by_status": {s.value: appointments_by_status.get(s.value, 0) for s in AppointmentStatus}
+        },
+        "revenue_by_month": revenue
+    }
+
+@app.post("/api/admin/stats/rebuild")
+async def rebuild_admin_stats(current_user: User = Depends(get_current_user)):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return await rebuild_stats()
+
+@app.get("/api/admin/export/cases")
+async def export_cases(
+    format: ExportFormat = ExportFormat.NDJSON,
+    gzip: bool = False,
+    status: Optional[CaseStatus] = None,
+    case_type: Optional[CaseType] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sort: SortOrder = SortOrder.DESC,
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    direction = DESCENDING if sort == SortOrder.DESC else ASCENDING
+    cursor = cases_collection.find(
+        case_query(status, case_type, created_from, created_to),
+        {"_id": 0},
+        batch_size=EXPORT_BATCH_SIZE
+    ).sort([("created_at", direction), ("id", direction)])
+    
+    return export_response(cursor, CASE_EXPORT_FIELDS, format, gzip, "cases")
+
+@app.get("/api/admin/export/appointments")
+async def export_appointments(
+    format: ExportFormat = ExportFormat.NDJSON,
+    gzip: bool = False,
+    status: Optional[AppointmentStatus] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sort: SortOrder = SortOrder.DESC,
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    direction = DESCENDING if sort == SortOrder.DESC else ASCENDING
+    cursor = appointments_collection.find(
+        appointment_query(status, created_from, created_to),
+        {"_id": 0},
+        batch_size=EXPORT_BATCH_SIZE
+    ).sort([("created_at", direction), ("id", direction)])
+    
+    return export_response(cursor, APPOINTMENT_EXPORT_FIELDS, format, gzip, "appointments")
+
+@app.get("/api/admin/password-pool")
+async def get_password_pool_stats(current_user: User = Depends(get_current_user)):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return password_pool.stats()
+
+@app.post("/api/admin/videos/cache/invalidate")
+async def invalidate_videos_cache(current_user: User = Depends(get_current_user)):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    invalidate_video_catalogue()
+    return {"message": "Video catalogue cache invalidated"}
+
+@app.post("/api/admin/storage/gc")
+async def run_storage_gc(recount: bool = False, current_user: User = Depends(get_current_user)):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return await collect_garbage(recount=recount)
+
+@app.get("/api/admin/jobs")
+async def get_jobs(
+    status: Optional[JobStatus] = None,
+    kind: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    query = {}
+    if status:
+        query["status"] = status
+    if kind:
+        query["kind"] = kind
+    
+    docs, next_cursor = await fetch_page(jobs_collection, query, cursor, SortOrder.DESC, limit, {"_id": 0})
+    counts = {s.value: 0 for s in JobStatus}
+    async for row in jobs_collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+        counts[row["_id"]] = row["count"]
+    
+    return ORJSONResponse({"items": docs, "next_cursor": next_cursor, "counts": counts})
+
+@app.post("/api/admin/jobs/{job_id}/retry")
+async def retry_job(job_id: str, current_user: User = Depends(get_current_user)):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    now = datetime.utcnow()
+    result = await jobs_collection.update_one(
+        {"id": job_id, "status": JobStatus.FAILED},
+        {"$set": {"status": JobStatus.QUEUED, "attempts": 0, "run_at": now, "last_error": None, "updated_at": now}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="No failed job with that id")
+    
+    wake_job_workers()
+    return {"message": "Job queued for retry"}
+
+@app.get("/api/admin/indexes")
+async def get_index_stats(current_user: User = Depends(get_current_user)):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    report = {}
+    for collection_name, indexes in INDEX_REGISTRY.items():
+        collection = db[collection_name]
+        coll_stats = await db.command("collStats", collection_name)
+        index_sizes = coll_stats.get("indexSizes", {})
+        
+        existing = {}
+        async for stat in collection.aggregate([{"$indexStats": {}}]):
+            existing[stat["name"]] = {
+                "name": stat["name"],
+                "key": stat["key"],
+                "size_bytes": index_sizes.get(stat["name"], 0),
+                "ops": stat["accesses"]["ops"],
+                "since": stat["accesses"]["since"],
+                "registered": False
+            }
+        
+        missing = []
+        for index in indexes:
+            name = index.document["name"]
+            if name in existing:
+                existing[name]["registered"] = True
+            else:
+                missing.append(name)
+        
+        report[collection_name] = {
+            "indexes": sorted(existing.values(), key=lambda i: i["name"]),
+            "missing": missing,
+            "total_index_size_bytes": coll_stats.get("totalIndexSize", 0)
+        }
+    
+    return report
+
+@app.post("/api/admin/users/{user_id}/revoke-tokens")
+async def revoke_tokens(user_id: str, current_user: User = Depends(get_current_user)):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if not await revoke_user_tokens(user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return {"message": "User tokens revoked successfully"}
+
+@app.post("/api/admin/cases/status/bulk")
+async def bulk_update_case_status(body: BulkCaseStatusUpdate, current_user: User = Depends(get_current_user)):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    projection = {"_id": 0, "id": 1, "user_id": 1, "status": 1}
+    if body.filter is not None:
+        if body.status is None or body.updates:
+            raise HTTPException(status_code=400, detail="A filter update needs a target status and no explicit updates")
+        
+        f = body.filter
+        query = case_query(f.status, f.case_type, f.created_from, f.created_to)
+        cases = await cases_collection.find(query, projection).limit(
+            MAX_BULK_STATUS_UPDATES + 1
+        ).to_list(MAX_BULK_STATUS_UPDATES + 1)
+        targets = {case["id"]: body.status for case in cases}
+    else:
+        if not body.updates:
+            raise HTTPException(status_code=400, detail="No updates given")
+        # Last entry wins for repeated case ids
+        targets = {update.case_id: update.status for update in body.updates}
+        cases = await cases_collection.find({"id": {"$in": list(targets)}}, projection).to_list(None)
+    
+    if len(targets) > MAX_BULK_STATUS_UPDATES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_STATUS_UPDATES} cases can be updated at once")
+    
+    current = {case["id"]: case for case in cases}
+    now = datetime.utcnow()
+    # Mongo keeps milliseconds; mark_status_conflicts compares updated_at to this
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    results = []
+    operations = []
+    pending = []
+    
+    for case_id, status in targets.items():
+        case = current.get(case_id)
+        if case is None:
+            results.append({"case_id": case_id, "status": status, "result": "not_found"})
+            continue
+        
+        result = {"case_id": case_id, "previous_status": case["status"], "status": status}
+        results.append(result)
+        if case["status"] == status:
+            result["result"] = "unchanged"
+            continue
+        
+        result["result"] = "updated"
+        # Pinned to the status read above, so a concurrent change makes this
+        # a no-op rather than a transition the rollups never saw
+        operations.append(UpdateOne(
+            {"id": case_id, "status": case["status"]},
+            {"$set": {"status": status, "updated_at": now}}
+        ))
+        pending.append((result, case))
+    
+    if operations:
+        try:
+            modified = (await cases_collection.bulk_write(operations, ordered=False)).modified_count
+        except BulkWriteError as e:
+            modified = e.details.get("nModified", 0)
+            for error in e.details.get("writeErrors", []):
+                result = pending[error["index"]][0]
+                result["result"] = "error"
+                result["error"] = error.get("errmsg")
+        
+        attempted = [(result, case) for result, case in pending if result["result"] == "updated"]
+        if modified < len(attempted):
+            await mark_status_conflicts(attempted, now)
+    
+    applied = [(result, case) for result, case in pending if result["result"] == "updated"]
+    await record_case_status_changes([(case["status"], result["status"]) for result, case in applied])
+    await invalidate_responses(
+        [f"cases:{case['user_id']}" for _, case in applied] + [f"case:{case['id']}" for _, case in applied]
+    )
+    for result, case in applied:
+        publish_case_status(case["user_id"], case_event(case["id"], result["status"], case["status"], now))
     
-    return cases
+    return {
+        "updated_at": now,
+        "updated": len(applied),
+        "results": results
+    }
+
+async def mark_status_conflicts(attempted: list, now: datetime):
+    # Updates that matched nothing lost a race with another status change;
+    # ours left the case with this request's status and updated_at
+    current = {
+        case["id"]: case
+        for case in await cases_collection.find(
+            {"id": {"$in": [case["id"] for _, case in attempted]}},
+            {"_id": 0, "id": 1, "status": 1, "updated_at": 1}
+        ).to_list(None)
+    }
+    for result, case in attempted:
+        latest = current.get(case["id"])
+        if latest is None or latest["status"] != result["status"] or latest.get("updated_at") != now:
+            result["result"] = "conflict"
+            result["current_status"] = latest["status"] if latest else None
 
 @app.put("/api/admin/cases/{case_id}/status")
 async def update_case_status(
@@ -467,14 +3922,21 @@ async def update_case_status(
     if status not in [s.value for s in CaseStatus]:
         raise HTTPException(status_code=400, detail="Invalid status")
     
-    result = await cases_collection.update_one(
+    now = datetime.utcnow()
+    previous = await cases_collection.find_one_and_update(
         {"id": case_id},
-        {"$set": {"status": status, "updated_at": datetime.utcnow()}}
+        {"$set": {"status": status, "updated_at": now}},
+        projection={"_id": 0, "user_id": 1, "status": 1},
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.modified_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Case not found")
     
+    await record_case_status_change(previous["status"], status)
+    await invalidate_responses([f"cases:{previous['user_id']}", f"case:{case_id}"])
+    publish_case_status(previous["user_id"], case_event(case_id, status, previous["status"], now))
+    
     return {"message": "Case status updated successfully"}
 
 if __name__ == "__main__":
@@ -173,6 +173,7 @@ class LawFirmAPITester:
     def test_get_user_cases(self):
         """Test retrieving user cases"""
         success, status, data = self.make_request('GET', 'api/cases')
+        data = data.get('items', data)
         
         if success and isinstance(data, list) and len(data) > 0:
             case = data[0]
@@ -210,6 +211,7 @@ class LawFirmAPITester:
     def test_get_user_appointments(self):
         """Test retrieving user appointments"""
         success, status, data = self.make_request('GET', 'api/appointments')
+        data = data.get('items', data)
         
         if success and isinstance(data, list) and len(data) > 0:
             appointment = data[0]
@@ -226,6 +228,7 @@ class LawFirmAPITester:
     def test_get_videos(self):
         """Test retrieving videos (public endpoint)"""
         success, status, data = self.make_request('GET', 'api/videos')
+        data = data.get('items', data)
         
         if success and isinstance(data, list):
             self.log_test("Get Videos", True, f"Retrieved {len(data)} videos")
@@ -293,6 +296,7 @@ class LawFirmAPITester:
         self.token = self.admin_token
         
         success, status, data = self.make_request('GET', 'api/admin/cases')
+        data = data.get('items', data)
         
         # Restore original token
         self.token = original_token
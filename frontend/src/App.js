@@ -45,6 +45,8 @@ function App() {
   
   // Booking form state
   const [appointmentDate, setAppointmentDate] = useState('');
+  const [availability, setAvailability] = useState(null);
+  const [availabilityDay, setAvailabilityDay] = useState('');
   const [appointmentNotes, setAppointmentNotes] = useState('');
   const [bookingLoading, setBookingLoading] = useState(false);
   const [bookingSuccess, setBookingSuccess] = useState(false);
@@ -53,10 +55,15 @@ function App() {
   // Dashboard state
   const [cases, setCases] = useState([]);
   const [appointments, setAppointments] = useState([]);
+  const [casesCursor, setCasesCursor] = useState(null);
+  const [appointmentsCursor, setAppointmentsCursor] = useState(null);
+  const [featuredVideos, setFeaturedVideos] = useState([]);
   const [dashboardLoading, setDashboardLoading] = useState(true);
   
   // Admin dashboard state
   const [adminCases, setAdminCases] = useState([]);
+  const [adminCasesCursor, setAdminCasesCursor] = useState(null);
+  const [adminStats, setAdminStats] = useState(null);
   const [adminUsers, setAdminUsers] = useState([]);
   const [adminLoading, setAdminLoading] = useState(true);
   const [selectedCase, setSelectedCase] = useState(null);
@@ -65,6 +72,8 @@ function App() {
   // Videos state
   const [videos, setVideos] = useState([]);
   const [videosLoading, setVideosLoading] = useState(true);
+  const [videosCursor, setVideosCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedCategory, setSelectedCategory] = useState('all');
 
   // Navigation and mobile menu state
@@ -136,48 +145,94 @@ function App() {
     }
   }, [token]);
 
+  useEffect(() => {
+    if (currentPage === 'booking' && isAuthenticated) {
+      fetchAvailability();
+    }
+  }, [currentPage, isAuthenticated]);
+
+  // Bookable slots for the next four weeks, as office wall-clock times
+  const fetchAvailability = async () => {
+    try {
+      const from = new Date();
+      const to = new Date(from.getTime() + 27 * 24 * 60 * 60 * 1000);
+      const query = `from=${from.toISOString().slice(0, 10)}&to=${to.toISOString().slice(0, 10)}`;
+      const response = await fetch(`${API_URL}/api/appointments/availability?${query}`);
+      if (response.ok) {
+        const data = await response.json();
+        setAvailability(data);
+        setAvailabilityDay(data.days.length > 0 ? data.days[0].date : '');
+        setAppointmentDate('');
+      }
+    } catch (error) {
+      console.error('Error fetching availability:', error);
+    }
+  };
+
   useEffect(() => {
     if (currentPage === 'videos') {
       fetchVideos();
     }
   }, [currentPage]);
 
-  const fetchVideos = async () => {
-    setVideosLoading(true);
+  // List endpoints return one page plus next_cursor; passing a cursor
+  // appends the following page instead of replacing the list
+  const fetchVideos = async (cursor = null) => {
+    cursor ? setLoadingMore(true) : setVideosLoading(true);
     try {
-      const response = await fetch(`${API_URL}/api/videos`);
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetch(`${API_URL}/api/videos${query}`);
       if (response.ok) {
         const data = await response.json();
-        setVideos(data);
+        setVideos((current) => cursor ? [...current, ...data.items] : data.items);
+        setVideosCursor(data.next_cursor);
       }
     } catch (error) {
       console.error('Error fetching videos:', error);
     } finally {
-      setVideosLoading(false);
+      cursor ? setLoadingMore(false) : setVideosLoading(false);
     }
   };
 
   useEffect(() => {
     if (currentPage === 'admin' && user?.role === 'admin') {
       fetchAdminData();
+      fetchAdminStats();
     }
   }, [currentPage, user]);
 
-  const fetchAdminData = async () => {
-    setAdminLoading(true);
+  // Card counts come from the server-side rollups, not the loaded pages
+  const fetchAdminStats = async () => {
     try {
-      const casesResponse = await fetch(`${API_URL}/api/admin/cases`, {
+      const response = await fetch(`${API_URL}/api/admin/stats?months=1`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+
+      if (response.ok) {
+        setAdminStats(await response.json());
+      }
+    } catch (error) {
+      console.error('Error fetching admin stats:', error);
+    }
+  };
+
+  const fetchAdminData = async (cursor = null) => {
+    cursor ? setLoadingMore(true) : setAdminLoading(true);
+    try {
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const casesResponse = await fetch(`${API_URL}/api/admin/cases${query}`, {
         headers: { 'Authorization': `Bearer ${token}` }
       });
 
       if (casesResponse.ok) {
         const casesData = await casesResponse.json();
-        setAdminCases(casesData);
+        setAdminCases((current) => cursor ? [...current, ...casesData.items] : casesData.items);
+        setAdminCasesCursor(casesData.next_cursor);
       }
     } catch (error) {
       console.error('Error fetching admin data:', error);
     } finally {
-      setAdminLoading(false);
+      cursor ? setLoadingMore(false) : setAdminLoading(false);
     }
   };
 
@@ -193,8 +248,11 @@ function App() {
       });
 
       if (response.ok) {
-        // Refresh admin data
-        fetchAdminData();
+        // Update the row in place so pages loaded with "Load more" stay
+        setAdminCases((current) => current.map((c) =>
+          c.id === caseId ? { ...c, status: newStatus } : c
+        ));
+        fetchAdminStats();
         setShowCaseModal(false);
       }
     } catch (error) {
@@ -208,26 +266,39 @@ function App() {
     }
   }, [currentPage, isAuthenticated]);
 
+  // Case status changes are pushed over SSE instead of polling /api/cases
+  useEffect(() => {
+    if (currentPage !== 'dashboard' || !isAuthenticated || !token) return;
+
+    const events = new EventSource(`${API_URL}/api/cases/events?access_token=${encodeURIComponent(token)}`);
+    events.addEventListener('status', (event) => {
+      const change = JSON.parse(event.data);
+      setCases((current) => current.map((c) =>
+        c.id === change.case_id ? { ...c, status: change.status, updated_at: change.updated_at } : c
+      ));
+    });
+    events.addEventListener('resync', () => fetchDashboardData());
+
+    return () => events.close();
+  }, [currentPage, isAuthenticated, token]);
+
+  // One request for the whole page; appointments=all asks for the full
+  // appointment history (completed and cancelled too), not just upcoming ones
   const fetchDashboardData = async () => {
     setDashboardLoading(true);
     try {
-      const [casesResponse, appointmentsResponse] = await Promise.all([
-        fetch(`${API_URL}/api/cases`, {
-          headers: { 'Authorization': `Bearer ${token}` }
-        }),
-        fetch(`${API_URL}/api/appointments`, {
-          headers: { 'Authorization': `Bearer ${token}` }
-        })
-      ]);
-
-      if (casesResponse.ok) {
-        const casesData = await casesResponse.json();
-        setCases(casesData);
-      }
+      const response = await fetch(
+        `${API_URL}/api/me/dashboard?cases_limit=50&appointments_limit=50&appointments=all&videos_limit=3`,
+        { headers: { 'Authorization': `Bearer ${token}` } }
+      );
 
-      if (appointmentsResponse.ok) {
-        const appointmentsData = await appointmentsResponse.json();
-        setAppointments(appointmentsData);
+      if (response.ok) {
+        const data = await response.json();
+        setCases(data.cases.items);
+        setCasesCursor(data.cases.next_cursor);
+        setAppointments(data.appointments.items);
+        setAppointmentsCursor(data.appointments.next_cursor);
+        setFeaturedVideos(data.videos.items);
       }
     } catch (error) {
       console.error('Error fetching dashboard data:', error);
@@ -236,6 +307,43 @@ function App() {
     }
   };
 
+  // Dashboard cursors are /api/cases and /api/appointments cursors
+  const fetchMoreCases = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await fetch(`${API_URL}/api/cases?limit=50&cursor=${encodeURIComponent(casesCursor)}`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      if (response.ok) {
+        const data = await response.json();
+        setCases((current) => [...current, ...data.items]);
+        setCasesCursor(data.next_cursor);
+      }
+    } catch (error) {
+      console.error('Error fetching cases:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const fetchMoreAppointments = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await fetch(`${API_URL}/api/appointments?limit=50&cursor=${encodeURIComponent(appointmentsCursor)}`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      if (response.ok) {
+        const data = await response.json();
+        setAppointments((current) => [...current, ...data.items]);
+        setAppointmentsCursor(data.next_cursor);
+      }
+    } catch (error) {
+      console.error('Error fetching appointments:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const fetchUserProfile = async () => {
     try {
       const { data, error } = await supabase.auth.getUser();
@@ -1840,6 +1948,15 @@ function App() {
                       </div>
                     </div>
                   ))}
+                  {casesCursor && (
+                    <button
+                      onClick={fetchMoreCases}
+                      disabled={loadingMore}
+                      className="w-full text-yellow-600 hover:text-yellow-800 font-medium disabled:opacity-50"
+                    >
+                      {loadingMore ? 'Loading...' : 'Load more cases'}
+                    </button>
+                  )}
                 </div>
               )}
             </div>
@@ -1892,10 +2009,45 @@ function App() {
                       </div>
                     </div>
                   ))}
+                  {appointmentsCursor && (
+                    <button
+                      onClick={fetchMoreAppointments}
+                      disabled={loadingMore}
+                      className="w-full text-yellow-600 hover:text-yellow-800 font-medium disabled:opacity-50"
+                    >
+                      {loadingMore ? 'Loading...' : 'Load more appointments'}
+                    </button>
+                  )}
                 </div>
               )}
             </div>
           </div>
+
+          {/* Featured Videos */}
+          {featuredVideos.length > 0 && (
+            <div className="bg-white rounded-lg shadow-lg p-6 mt-8">
+              <div className="flex justify-between items-center mb-6">
+                <h2 className="text-xl font-semibold text-gray-900">Featured Videos</h2>
+                <button
+                  onClick={() => setCurrentPage('videos')}
+                  className="text-yellow-600 hover:text-yellow-800 text-sm font-medium"
+                >
+                  View all videos
+                </button>
+              </div>
+              <div className="grid md:grid-cols-3 gap-4">
+                {featuredVideos.map((video) => (
+                  <div key={video.id} className="border rounded-lg overflow-hidden hover:shadow-md transition-shadow">
+                    <img src={video.thumbnail_url} alt={video.title} className="w-full h-32 object-cover" />
+                    <div className="p-4">
+                      <h3 className="font-semibold text-gray-900 text-sm">{video.title}</h3>
+                      <p className="text-xs text-gray-500 mt-1">{video.views} views</p>
+                    </div>
+                  </div>
+                ))}
+              </div>
+            </div>
+          )}
         </div>
       </div>
     );
@@ -1928,6 +2080,8 @@ function App() {
           setAppointmentNotes('');
         } else {
           setBookingError(data.detail || 'Failed to book appointment');
+          // The slot may have just been taken
+          fetchAvailability();
         }
       } catch (error) {
         setBookingError('Network error. Please try again.');
@@ -1958,8 +2112,7 @@ function App() {
       );
     }
 
-    const now = new Date();
-    const minDate = new Date(now.getTime() + 24 * 60 * 60 * 1000).toISOString().slice(0, 16);
+    const daySlots = availability?.days.find((day) => day.date === availabilityDay)?.slots || [];
 
     return (
       <div className="min-h-screen bg-gray-50 py-12 px-4 sm:px-6 lg:px-8">
@@ -1978,14 +2131,43 @@ function App() {
                 <label className="block text-sm font-medium text-gray-700 mb-2">
                   Appointment Date & Time
                 </label>
-                <input
-                  type="datetime-local"
-                  required
-                  min={minDate}
-                  value={appointmentDate}
-                  onChange={(e) => setAppointmentDate(e.target.value)}
-                  className="w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-yellow-500 focus:border-yellow-500"
-                />
+                {!availability ? (
+                  <p className="text-sm text-gray-500">Loading available times...</p>
+                ) : availability.days.length === 0 ? (
+                  <p className="text-sm text-gray-500">No appointments are available in the next four weeks.</p>
+                ) : (
+                  <div className="grid grid-cols-2 gap-4">
+                    <select
+                      required
+                      value={availabilityDay}
+                      onChange={(e) => {
+                        setAvailabilityDay(e.target.value);
+                        setAppointmentDate('');
+                      }}
+                      className="w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-yellow-500 focus:border-yellow-500"
+                    >
+                      {availability.days.map((day) => (
+                        <option key={day.date} value={day.date}>
+                          {new Date(`${day.date}T00:00:00`).toLocaleDateString()}
+                        </option>
+                      ))}
+                    </select>
+                    <select
+                      required
+                      value={appointmentDate}
+                      onChange={(e) => setAppointmentDate(e.target.value)}
+                      className="w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-yellow-500 focus:border-yellow-500"
+                    >
+                      <option value="">Select a time</option>
+                      {daySlots.map((slot) => (
+                        <option key={slot} value={slot}>{slot.slice(11, 16)}</option>
+                      ))}
+                    </select>
+                  </div>
+                )}
+                {availability && (
+                  <p className="text-xs text-gray-500 mt-2">Times are office time ({availability.timezone}).</p>
+                )}
               </div>
 
               <div>
@@ -2069,7 +2251,7 @@ function App() {
                   </svg>
                 </div>
                 <div className="ml-4">
-                  <p className="text-2xl font-bold text-gray-900">{adminCases.length}</p>
+                  <p className="text-2xl font-bold text-gray-900">{adminStats?.cases.total ?? '—'}</p>
                   <p className="text-gray-600">Total Cases</p>
                 </div>
               </div>
@@ -2084,7 +2266,7 @@ function App() {
                 </div>
                 <div className="ml-4">
                   <p className="text-2xl font-bold text-gray-900">
-                    {adminCases.filter(c => c.status === 'pending').length}
+                    {adminStats?.cases.by_status.pending ?? '—'}
                   </p>
                   <p className="text-gray-600">Pending Cases</p>
                 </div>
@@ -2100,7 +2282,7 @@ function App() {
                 </div>
                 <div className="ml-4">
                   <p className="text-2xl font-bold text-gray-900">
-                    {adminCases.filter(c => c.status === 'in_progress').length}
+                    {adminStats?.cases.by_status.in_progress ?? '—'}
                   </p>
                   <p className="text-gray-600">Active Cases</p>
                 </div>
@@ -2189,6 +2371,17 @@ function App() {
                 </tbody>
               </table>
             </div>
+            {adminCasesCursor && (
+              <div className="px-6 py-4 border-t border-gray-200 text-center">
+                <button
+                  onClick={() => fetchAdminData(adminCasesCursor)}
+                  disabled={loadingMore}
+                  className="text-yellow-600 hover:text-yellow-800 font-medium disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more cases'}
+                </button>
+              </div>
+            )}
           </div>
 
           {/* Case Modal */}
@@ -2364,6 +2557,18 @@ function App() {
               ))}
             </div>
           )}
+
+          {!videosLoading && videosCursor && (
+            <div className="text-center mt-8">
+              <button
+                onClick={() => fetchVideos(videosCursor)}
+                disabled={loadingMore}
+                className="bg-white text-gray-700 hover:bg-gray-100 shadow-md px-6 py-2 rounded-full font-medium disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : 'Load more videos'}
+              </button>
+            </div>
+          )}
         </div>
       </div>
     );
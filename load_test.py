@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""Local load test for the Union Law Firm API.
+
+Boots backend/server.py in-process against an in-memory Mongo stand-in
+(mongomock-motor) and drives realistic traffic mixes through an ASGI
+transport, so no server, database or network is needed. Reports p50/p95/p99
+latency and throughput per endpoint and compares them with a stored JSON
+baseline.
+
+    python load_test.py                    # run and print the report
+    python load_test.py --check            # exit 1 on regression against the baseline
+    python load_test.py --update-baseline  # record this run as the new baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(ROOT, "tests", "baselines", "load_test.json")
+PASSWORD = "LoadTest123!"
+ADMIN_EMAIL = "admin@unionlaw.com"
+ADMIN_PASSWORD = "admin123"
+
+
+def boot_server(workdir):
+    """Import the app with storage in workdir and Motor replaced by mongomock."""
+    os.environ.setdefault("MONGO_URL", "mongodb://load-test")
+    os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    os.environ["VIEW_JOURNAL_DIR"] = os.path.join(workdir, "journal")
+    os.environ["RATE_LIMIT_SQLITE_PATH"] = os.path.join(workdir, "rate_limits.sqlite3")
+    # Every request comes from the same loopback client, so the auth limits
+    # would turn a login storm into a stream of 429s
+    os.environ["AUTH_RATE_LIMIT_PER_IP"] = "1000000"
+    os.environ["AUTH_RATE_LIMIT_PER_EMAIL"] = "1000000"
+    # Post-upload processing would share the one in-process event loop with
+    # the requests being measured; set JOB_WORKERS to include it
+    os.environ.setdefault("JOB_WORKERS", "0")
+
+    import motor.motor_asyncio
+    from mongomock_motor import AsyncMongoMockClient
+
+    motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+    sys.path.insert(0, os.path.join(ROOT, "backend"))
+    import server
+    return server
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.elapsed = {}
+
+    def add(self, endpoint, seconds, ok):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self):
+        results = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            samples.sort()
+            elapsed = self.elapsed.get(endpoint.split(" ", 1)[0], 0)
+            results[endpoint] = {
+                "count": len(samples),
+                "errors": self.errors.get(endpoint, 0),
+                "rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            }
+        return results
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return 0.0
+    rank = max(1, -(-len(samples) * pct // 100))
+    return samples[int(rank) - 1]
+
+
+class LoadTester:
+    def __init__(self, server, client, concurrency, scale):
+        self.server = server
+        self.client = client
+        self.concurrency = concurrency
+        self.scale = scale
+        self.recorder = Recorder()
+        self.users = []
+        self.admin_headers = None
+
+    async def call(self, scenario, endpoint, method, url, expected_status=200, **kwargs):
+        start = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - start
+        self.recorder.add(f"{scenario} {endpoint}", elapsed, response.status_code == expected_status)
+        return response
+
+    async def run_scenario(self, name, iterations, task):
+        """Run task(i) for every iteration with at most `concurrency` in flight."""
+        queue = asyncio.Queue()
+        for i in range(iterations):
+            queue.put_nowait(i)
+
+        async def worker():
+            while True:
+                try:
+                    i = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await task(i)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - start
+        self.recorder.elapsed[name] = elapsed
+        print(f"  {name}: {iterations} iterations in {elapsed:.2f}s")
+
+    async def seed(self, user_count, cases_per_user):
+        """Insert users and cases directly so setup does not pay for bcrypt per user."""
+        server = self.server
+        hashed = server.hash_password(PASSWORD)
+        now = datetime.utcnow()
+        users, cases = [], []
+        for i in range(user_count):
+            user_id = str(uuid.uuid4())
+            users.append({
+                "id": user_id,
+                "email": f"load_user_{i}@example.com",
+                "password": hashed,
+                "name": f"Load User {i}",
+                "role": server.UserRole.CLIENT,
+                "phone": None,
+                "token_version": 0,
+                "created_at": now,
+            })
+            for j in range(cases_per_user):
+                title = f"Case {j} for user {i}"
+                description = "Seeded by the load test"
+                cases.append({
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "case_type": random.choice(list(server.CaseType)).value,
+                    "title": title,
+                    "description": description,
+                    "status": server.CaseStatus.PENDING.value,
+                    "files": [],
+                    "search_terms": server.search_terms(title, description),
+                    "created_at": now,
+                    "updated_at": now,
+                })
+        await server.users_collection.insert_many(users)
+        if cases:
+            await server.cases_collection.insert_many(cases)
+        await server.rebuild_stats()
+
+        for user in users:
+            token = server.create_access_token(data=server.token_claims(user))
+            self.users.append({
+                "email": user["email"],
+                "headers": {"Authorization": f"Bearer {token}"},
+            })
+
+        response = await self.client.post(
+            "/api/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        response.raise_for_status()
+        self.admin_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def login_storm(self, i):
+        user = self.users[i % len(self.users)]
+        await self.call("login_storm", "POST /api/auth/login", "POST", "/api/auth/login",
+                        json={"email": user["email"], "password": PASSWORD})
+
+    async def dashboard(self, i):
+        # The client dashboard loads these together on every visit
+        headers = self.users[i % len(self.users)]["headers"]
+        await asyncio.gather(
+            self.call("dashboard", "GET /api/auth/me", "GET", "/api/auth/me", headers=headers),
+            self.call("dashboard", "GET /api/cases", "GET", "/api/cases", headers=headers),
+            self.call("dashboard", "GET /api/appointments", "GET", "/api/appointments", headers=headers),
+            self.call("dashboard", "GET /api/videos", "GET", "/api/videos", headers=headers),
+        )
+
+    async def dashboard_combined(self, i):
+        headers = self.users[i % len(self.users)]["headers"]
+        await self.call("dashboard_combined", "GET /api/me/dashboard", "GET", "/api/me/dashboard", headers=headers)
+
+    async def case_upload(self, i):
+        headers = self.users[i % len(self.users)]["headers"]
+        files = [
+            ("files", (f"document_{i}_{n}.pdf", os.urandom(64 * 1024), "application/pdf"))
+            for n in range(3)
+        ]
+        data = {"case_type": "divorce", "title": f"Load case {i}", "description": "Uploaded by the load test"}
+        await self.call("case_upload", "POST /api/cases", "POST", "/api/cases",
+                        headers=headers, data=data, files=files)
+
+    async def admin_listing(self, i):
+        response = await self.call("admin_listing", "GET /api/admin/cases", "GET", "/api/admin/cases",
+                                   headers=self.admin_headers)
+        next_cursor = response.json().get("next_cursor") if response.status_code == 200 else None
+        if next_cursor:
+            await self.call("admin_listing", "GET /api/admin/cases (next page)", "GET", "/api/admin/cases",
+                            headers=self.admin_headers, params={"cursor": next_cursor})
+        await self.call("admin_listing", "GET /api/admin/stats", "GET", "/api/admin/stats",
+                        headers=self.admin_headers)
+
+    async def run(self):
+        iterations = max(1, int(100 * self.scale))
+        print("Seeding data...")
+        await self.seed(user_count=max(1, int(50 * self.scale)), cases_per_user=5)
+        print("Running scenarios:")
+        await self.run_scenario("login_storm", iterations, self.login_storm)
+        await self.run_scenario("dashboard", iterations * 2, self.dashboard)
+        await self.run_scenario("dashboard_combined", iterations * 2, self.dashboard_combined)
+        await self.run_scenario("case_upload", iterations, self.case_upload)
+        await self.run_scenario("admin_listing", iterations, self.admin_listing)
+        return self.recorder.report()
+
+
+async def run_load_test(concurrency, scale):
+    import httpx
+
+    with tempfile.TemporaryDirectory(prefix="load_test_") as workdir:
+        server = boot_server(workdir)
+        await server.startup_event()
+        try:
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=60) as client:
+                return await LoadTester(server, client, concurrency, scale).run()
+        finally:
+            await server.shutdown_event()
+
+
+def compare(results, baseline, tolerance, slack_ms):
+    """Return a list of human-readable regressions against the baseline."""
+    regressions = []
+    for endpoint, expected in baseline["endpoints"].items():
+        actual = results.get(endpoint)
+        if actual is None:
+            regressions.append(f"{endpoint}: missing from this run")
+            continue
+        if actual["errors"]:
+            regressions.append(f"{endpoint}: {actual['errors']} failed requests")
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            # Fast endpoints jitter by more than any ratio, so small absolute
+            # differences never count as regressions
+            limit = max(expected[key] * (1 + tolerance), expected[key] + slack_ms)
+            if actual[key] > limit:
+                regressions.append(f"{endpoint}: {key} {actual[key]} > {limit:.2f} (baseline {expected[key]})")
+        min_rps = expected["rps"] / (1 + tolerance)
+        if actual["rps"] < min_rps:
+            regressions.append(f"{endpoint}: rps {actual['rps']} < {min_rps:.1f} (baseline {expected['rps']})")
+    return regressions
+
+
+def print_report(results):
+    print(f"\n{'endpoint':<58} {'count':>6} {'err':>4} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, r in results.items():
+        print(f"{endpoint:<58} {r['count']:>6} {r['errors']:>4} {r['rps']:>8} "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=20, help="requests in flight per scenario")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for iterations and seeded data")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--check", action="store_true", help="fail when results regress against the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative slowdown (0.5 = 50%%)")
+    parser.add_argument("--slack-ms", type=float, default=5.0, help="allowed absolute latency increase")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load_test(args.concurrency, args.scale))
+    print_report(results)
+
+    run = {
+        "meta": {
+            "recorded_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "concurrency": args.concurrency,
+            "scale": args.scale,
+        },
+        "endpoints": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2)
+            f.write("\n")
+        print(f"\n📝 Baseline written to {args.baseline}")
+
+    failed = any(r["errors"] for r in results.values())
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"\n❌ No baseline at {args.baseline}; run with --update-baseline first")
+            return 1
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline["meta"]["concurrency"], baseline["meta"]["scale"]) != (args.concurrency, args.scale):
+            print("\n⚠️  Baseline was recorded with different --concurrency/--scale; comparison may be meaningless")
+        regressions = compare(results, baseline, args.tolerance, args.slack_ms)
+        for regression in regressions:
+            print(f"❌ {regression}")
+        if regressions:
+            failed = True
+        else:
+            print("\n✅ No regressions against baseline")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -119,6 +119,7 @@ class SimpleLawFirmAPITester:
     def test_get_videos(self):
         """Test retrieving videos (public endpoint)"""
         success, status, data = self.make_request('GET', 'api/videos')
+        data = data.get('items', data)
         
         if success and isinstance(data, list):
             self.log_test("Get Videos", True, f"Retrieved {len(data)} videos")
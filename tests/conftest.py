@@ -0,0 +1,232 @@
+"""Benchmark harness for backend hot paths.
+
+Every test that takes the ``benchmark`` fixture is timed and its results are
+collected per test id. Results can be written to JSON and compared against
+the stored baseline in tests/baselines/benchmarks.json:
+
+    pytest tests                                   # run and print timings
+    pytest tests --bench-compare                   # fail tests slower than the baseline
+    pytest tests --bench-update                    # record this run as the baseline
+    pytest tests --bench-sizes=10000,100000,1000000 --bench-json=run.json
+
+Dataset-driven tests take the ``dataset_size`` argument and are parametrized
+with --bench-sizes. The 1M-case dataset needs a few GB of memory, so it is
+opt-in.
+"""
+
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, "tests", "baselines", "benchmarks.json")
+
+# server.py reads its settings at import time
+_workdir = tempfile.mkdtemp(prefix="benchmarks_")
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_workdir, "uploads"))
+os.environ.setdefault("VIEW_JOURNAL_DIR", os.path.join(_workdir, "journal"))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+MIN_ROUND_SECONDS = 0.02
+
+_results = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption("--bench-sizes", default="10000",
+                    help="comma-separated dataset sizes for dataset_size tests (default: 10000)")
+    group.addoption("--bench-rounds", type=int, default=5, help="timed rounds per benchmark")
+    group.addoption("--bench-json", help="write this run's results to a JSON file")
+    group.addoption("--bench-baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    group.addoption("--bench-compare", action="store_true",
+                    help="fail benchmarks whose best round regresses beyond --bench-tolerance")
+    group.addoption("--bench-tolerance", type=float, default=0.5,
+                    help="allowed relative slowdown against the baseline (0.5 = 50%%)")
+    group.addoption("--bench-update", action="store_true", help="merge this run into the baseline file")
+
+
+def pytest_generate_tests(metafunc):
+    if "dataset_size" in metafunc.fixturenames:
+        sizes = [int(s) for s in metafunc.config.getoption("--bench-sizes").split(",")]
+        metafunc.parametrize("dataset_size", sizes, ids=[f"{s // 1000}k" for s in sizes])
+
+
+def load_baseline(config):
+    path = config.getoption("--bench-baseline")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get("benchmarks", {})
+
+
+class Benchmark:
+    """Times a callable the way timeit does: gc off, calibrated loop count.
+
+    Comparisons use the fastest round, which is the least disturbed by other
+    load on the machine.
+    """
+
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.rounds = config.getoption("--bench-rounds")
+        self.stats = None
+
+    def __call__(self, fn, *args, **kwargs):
+        result = fn(*args, **kwargs)  # warm-up, and the value handed back to the test
+        start = time.perf_counter()
+        fn(*args, **kwargs)
+        single = time.perf_counter() - start
+        number = max(1, int(MIN_ROUND_SECONDS / single)) if single > 0 else 1000
+
+        timings = []
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(self.rounds):
+                start = time.perf_counter()
+                for _ in range(number):
+                    fn(*args, **kwargs)
+                timings.append((time.perf_counter() - start) / number)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        self.stats = {
+            "median_s": statistics.median(timings),
+            "min_s": min(timings),
+            "mean_s": statistics.fmean(timings),
+            "stdev_s": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            "rounds": self.rounds,
+            "iterations": number,
+        }
+        _results[self.name] = self.stats
+        if self.config.getoption("--bench-compare"):
+            self.compare()
+        return result
+
+    def compare(self):
+        expected = load_baseline(self.config).get(self.name)
+        if not expected:
+            return
+        limit = expected["min_s"] * (1 + self.config.getoption("--bench-tolerance"))
+        if self.stats["min_s"] > limit:
+            pytest.fail(
+                f"{self.name} regressed: {format_seconds(self.stats['min_s'])} "
+                f"> {format_seconds(limit)} (baseline {format_seconds(expected['min_s'])})"
+            )
+
+
+@pytest.fixture
+def benchmark(request):
+    return Benchmark(request.node.nodeid.split("::", 1)[-1], request.config)
+
+
+@pytest.fixture(scope="session")
+def server():
+    import server as server_module
+    return server_module
+
+
+_datasets = {}
+
+
+def generate_cases(size, user_count=None):
+    """Deterministic case documents shaped like rows of the cases collection."""
+    if size in _datasets:
+        return _datasets[size]
+    rng = random.Random(size)
+    user_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(user_count or max(1, size // 10))]
+    case_types = ["divorce", "inheritance", "custody", "alimony", "other"]
+    statuses = ["pending", "under_review", "in_progress", "completed", "rejected"]
+    start = datetime(2024, 1, 1)
+    docs = []
+    for i in range(size):
+        created_at = start + timedelta(minutes=i)
+        files = []
+        for n in range(rng.randrange(4)):
+            files.append({
+                "name": f"{uuid.UUID(int=rng.getrandbits(128))}.pdf",
+                "original_name": f"document_{n}.pdf",
+                "content_type": "application/pdf",
+                "size": rng.randrange(10_000, 5_000_000),
+                "sha256": f"{rng.getrandbits(256):064x}",
+                "uploaded_at": created_at,
+                "storage": "blob",
+            })
+        # Roughly one in ten cases predates file metadata and stores bare names
+        if files and rng.random() < 0.1:
+            files = [f["name"] for f in files]
+        docs.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "user_id": rng.choice(user_ids),
+            "case_type": rng.choice(case_types),
+            "title": f"Case {i} regarding family matter",
+            "description": "Client requests assistance with proceedings. " * rng.randrange(1, 6),
+            "status": rng.choice(statuses),
+            "files": files,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    _datasets[size] = docs
+    return docs
+
+
+@pytest.fixture
+def cases(dataset_size):
+    return generate_cases(dataset_size)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not _results:
+        return
+    baseline = load_baseline(config)
+    terminalreporter.section("benchmarks")
+    terminalreporter.write_line(f"{'benchmark':<64} {'min':>12} {'median':>12} {'vs baseline':>12}")
+    for name, stats in sorted(_results.items()):
+        expected = baseline.get(name)
+        delta = f"{(stats['min_s'] / expected['min_s'] - 1) * 100:+.1f}%" if expected else "new"
+        terminalreporter.write_line(
+            f"{name:<64} {format_seconds(stats['min_s']):>12} {format_seconds(stats['median_s']):>12} {delta:>12}"
+        )
+
+    run = {
+        "meta": {
+            "recorded_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "benchmarks": dict(sorted(_results.items())),
+    }
+    if config.getoption("--bench-json"):
+        with open(config.getoption("--bench-json"), "w") as f:
+            json.dump(run, f, indent=2)
+    if config.getoption("--bench-update"):
+        # Merge so a partial run (-k, other sizes) keeps the other entries
+        run["benchmarks"] = dict(sorted({**baseline, **_results}.items()))
+        path = config.getoption("--bench-baseline")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(run, f, indent=2)
+            f.write("\n")
+        terminalreporter.write_line(f"baseline written to {path}")
+
+
+def format_seconds(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+CLIENTS = [
+    {"id": f"client-{n}", "email": f"client{n}@example.com", "name": f"Client {n}", "role": "client",
+     "created_at": datetime(2024, 1, 1)}
+    for n in range(5)
+]
+
+
+class SlowInserts:
+    """Collection proxy whose inserts take a while, like a loaded primary."""
+
+    def __init__(self, collection, delay):
+        self.collection = collection
+        self.delay = delay
+
+    async def insert_one(self, *args, **kwargs):
+        await asyncio.sleep(self.delay)
+        return await self.collection.insert_one(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+@pytest.fixture
+def db(server, monkeypatch):
+    db = AsyncMongoMockClient().law_firm_db
+    for name in ("appointments", "appointment_slots", "stats"):
+        monkeypatch.setattr(server, f"{name}_collection", db[name])
+    monkeypatch.setattr(server, "response_cache", None)
+    return db
+
+
+def next_slot(server):
+    day = server.office_now().date() + timedelta(days=1)
+    while not server.day_slots(day):
+        day += timedelta(days=1)
+    return server.day_slots(day)[0]
+
+
+def book(server, slot, user):
+    return server.create_appointment(server.AppointmentCreate(appointment_date=slot), current_user=server.User(**user))
+
+
+async def book_concurrently(server, slot):
+    results = await asyncio.gather(*(book(server, slot, user) for user in CLIENTS), return_exceptions=True)
+    booked = [r for r in results if isinstance(r, dict)]
+    rejected = [r for r in results if isinstance(r, HTTPException) and r.status_code == 409]
+    assert len(booked) + len(rejected) == len(results), results
+    return booked
+
+
+def test_concurrent_bookings_claim_slot_once(server, db, monkeypatch):
+    monkeypatch.setattr(server, "appointments_collection", SlowInserts(db.appointments, 0.05))
+
+    async def run():
+        await db.appointment_slots.create_index("start", unique=True)
+        slot = next_slot(server)
+        booked = await book_concurrently(server, slot)
+        assert len(booked) == 1
+        assert await db.appointments.count_documents({"appointment_date": slot}) == 1
+
+    asyncio.run(run())
+
+
+def test_cancelled_or_abandoned_claims_are_taken_over(server, db):
+    async def run():
+        await db.appointment_slots.create_index("start", unique=True)
+        slot = next_slot(server)
+
+        booked = await book(server, slot, CLIENTS[0])
+        await db.appointments.update_one({"id": booked["appointment_id"]}, {"$set": {"status": "cancelled"}})
+        assert len(await book_concurrently(server, slot)) == 1
+
+        # A claim whose appointment never got inserted frees up after the grace period
+        later = slot + timedelta(minutes=server.APPOINTMENT_SLOT_MINUTES)
+        stale = datetime.utcnow() - timedelta(seconds=server.APPOINTMENT_SLOT_CLAIM_GRACE_SECONDS + 1)
+        await db.appointment_slots.insert_one({"start": later, "appointment_id": "lost", "created_at": stale})
+        assert len(await book_concurrently(server, later)) == 1
+
+    asyncio.run(run())
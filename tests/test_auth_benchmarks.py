@@ -0,0 +1,55 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+
+USER = {
+    "id": "3f1c2a9e-0d4b-4c6e-9a57-1b2c3d4e5f60",
+    "email": "client@example.com",
+    "name": "Benchmark Client",
+    "role": "client",
+    "phone": "+961-70-123456",
+    "token_version": 0,
+    "created_at": datetime(2024, 1, 1),
+}
+
+
+@pytest.fixture
+def token(server):
+    return server.create_access_token(data=server.token_claims(USER), expires_delta=timedelta(minutes=30))
+
+
+def test_create_access_token(benchmark, server):
+    claims = server.token_claims(USER)
+    benchmark(server.create_access_token, claims, timedelta(minutes=30))
+
+
+def test_jwt_decode(benchmark, server, token):
+    payload = benchmark(jwt.decode, token, server.SECRET_KEY, algorithms=[server.ALGORITHM])
+    assert payload["uid"] == USER["id"]
+
+
+def test_authenticate_cached_principal(benchmark, server, token):
+    # Decode plus principal cache hit, i.e. get_current_user without a DB
+    # round-trip; includes the cost of driving the coroutine on a loop
+    server.principal_cache.put(USER["id"], server.user_from_document(USER), 0)
+    loop = asyncio.new_event_loop()
+    try:
+        user = benchmark(lambda: loop.run_until_complete(server.authenticate(token)))
+    finally:
+        loop.close()
+        server.principal_cache.invalidate(USER["id"])
+    assert user.id == USER["id"]
+
+
+def test_hash_password(benchmark, server):
+    benchmark.rounds = 3
+    hashed = benchmark(server.hash_password, "BenchmarkPass123!")
+    assert hashed.startswith("$2")
+
+
+def test_verify_password(benchmark, server):
+    benchmark.rounds = 3
+    hashed = server.hash_password("BenchmarkPass123!")
+    assert benchmark(server.verify_password, "BenchmarkPass123!", hashed)
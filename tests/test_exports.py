@@ -0,0 +1,109 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+ADMIN = {"id": "admin-1", "email": "admin@example.com", "name": "Admin", "role": "admin",
+         "created_at": datetime(2024, 1, 1)}
+CLIENT = {"id": "client-1", "email": "client@example.com", "name": "Client", "role": "client",
+          "created_at": datetime(2024, 1, 1)}
+UPLOADED_AT = datetime(2024, 3, 1, 9, 30)
+
+
+@pytest.fixture
+def db(server, monkeypatch):
+    db = AsyncMongoMockClient().law_firm_db
+    for name in ("users", "cases", "appointments"):
+        monkeypatch.setattr(server, f"{name}_collection", db[name])
+
+    async def seed():
+        await db.users.insert_many([dict(ADMIN), dict(CLIENT)])
+        await db.cases.insert_one({
+            "id": "case-1", "user_id": CLIENT["id"], "case_type": "divorce", "title": "طلاق",
+            "description": "Line one,\n\"quoted\"", "status": "pending",
+            "files": [
+                {"name": "a.pdf", "original_name": "a.pdf", "size": 10, "storage": "blob",
+                 "uploaded_at": UPLOADED_AT,
+                 "processing": {"status": "done", "processed_at": UPLOADED_AT, "type": {"mime": "application/pdf"}}},
+                "legacy.txt",
+            ],
+            "created_at": datetime(2024, 3, 1), "updated_at": datetime(2024, 3, 2),
+        })
+
+    asyncio.run(seed())
+    return db
+
+
+def export_cases(server, **params):
+    async def run():
+        response = await server.export_cases(current_user=server.User(**ADMIN), **params)
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(run())
+
+
+def test_ndjson_export_encodes_file_entries(server, db):
+    body = export_cases(server, format=server.ExportFormat.NDJSON)
+    rows = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+    assert len(rows) == 1
+    row = rows[0]
+    assert row["title"] == "طلاق" and row["user_name"] == "Client"
+    assert row["created_at"] == "2024-03-01T00:00:00"
+    assert row["files"][0]["uploaded_at"] == "2024-03-01T09:30:00"
+    assert row["files"][0]["processing"]["processed_at"] == "2024-03-01T09:30:00"
+    assert row["files"][1] == {"name": "legacy.txt"}
+
+
+def test_csv_export_lists_file_names(server, db):
+    body = export_cases(server, format=server.ExportFormat.CSV)
+    header, row = list(csv.reader(io.StringIO(body.decode("utf-8"))))
+    assert header == server.CASE_EXPORT_FIELDS
+    record = dict(zip(header, row))
+    assert record["files"] == "a.pdf;legacy.txt"
+    assert record["description"] == "Line one,\n\"quoted\""
+    assert record["created_at"] == "2024-03-01T00:00:00"
+
+
+def export_appointments(server, **params):
+    async def run():
+        response = await server.export_appointments(current_user=server.User(**ADMIN), **params)
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def appointment(db):
+    asyncio.run(db.appointments.insert_one({
+        "id": "appointment-1", "user_id": CLIENT["id"], "appointment_date": datetime(2024, 4, 1, 10),
+        "status": "pending", "payment_status": "pending", "amount": 100.0, "notes": None,
+        "created_at": datetime(2024, 3, 1),
+    }))
+
+
+@pytest.mark.parametrize("export_format", ["ndjson", "csv"])
+def test_gzip_export_matches_plain(server, db, appointment, export_format):
+    export_format = server.ExportFormat(export_format)
+    for export in (export_cases, export_appointments):
+        plain = export(server, format=export_format)
+        compressed = export(server, format=export_format, gzip=True)
+        assert compressed[:2] == b"\x1f\x8b"
+        assert gzip.decompress(compressed) == plain
+
+
+def test_appointment_exports(server, db, appointment):
+    row = json.loads(export_appointments(server, format=server.ExportFormat.NDJSON))
+    assert row["appointment_date"] == "2024-04-01T10:00:00" and row["notes"] is None
+    assert row["user_email"] == CLIENT["email"]
+
+    header, values = list(csv.reader(io.StringIO(export_appointments(server, format=server.ExportFormat.CSV).decode())))
+    record = dict(zip(header, values))
+    assert record["amount"] == "100.0" and record["notes"] == ""
+
+
+def test_export_value_encodes_nested_values(server):
+    value = server.export_value({"at": datetime(2024, 1, 1), "tags": [server.CaseStatus.PENDING]})
+    assert json.loads(value) == {"at": "2024-01-01T00:00:00", "tags": ["pending"]}
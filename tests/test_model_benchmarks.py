@@ -0,0 +1,24 @@
+from datetime import datetime
+
+USER = {
+    "id": "3f1c2a9e-0d4b-4c6e-9a57-1b2c3d4e5f60",
+    "email": "client@example.com",
+    "name": "Benchmark Client",
+    "role": "client",
+    "phone": None,
+    "created_at": datetime(2024, 1, 1),
+}
+
+
+def test_user_model(benchmark, server):
+    user = benchmark(server.user_from_document, USER)
+    assert user.email == USER["email"]
+
+
+def test_case_model_list(benchmark, server, cases):
+    # What validating every listed document through the Case model would cost
+    def build():
+        return [server.Case(**{**case, "files": server.case_files(case)}) for case in cases]
+
+    models = benchmark(build)
+    assert len(models) == len(cases)
@@ -0,0 +1,78 @@
+"""List handler serialization: rebuilt dicts through jsonable_encoder and
+json.dumps, as the handlers originally did, against projected documents
+rendered with orjson. Each document is shallow-copied first, standing in
+for the fresh dicts the driver hands back per query."""
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+
+def rebuild_case(case):
+    return {
+        "id": case["id"],
+        "case_type": case["case_type"],
+        "title": case["title"],
+        "description": case["description"],
+        "status": case["status"],
+        "files": case["files"],
+        "created_at": case["created_at"],
+        "updated_at": case["updated_at"],
+    }
+
+
+def owners(cases):
+    return {
+        case["user_id"]: {"id": case["user_id"], "name": "Client", "email": "client@example.com"}
+        for case in cases
+    }
+
+
+def test_case_list_rebuilt_jsonable(benchmark, cases):
+    def render():
+        docs = [rebuild_case(dict(case)) for case in cases]
+        return JSONResponse(jsonable_encoder(docs)).body
+
+    body = benchmark(render)
+    assert body.startswith(b"[")
+
+
+def test_case_list_projected_orjson(benchmark, server, cases):
+    def render():
+        docs = [server.normalize_case(dict(case)) for case in cases]
+        return ORJSONResponse({"items": docs, "next_cursor": None}).body
+
+    body = benchmark(render)
+    assert len(orjson.loads(body)["items"]) == len(cases)
+
+
+def test_admin_case_list_rebuilt_jsonable(benchmark, cases):
+    users = owners(cases)
+
+    def render():
+        docs = []
+        for case in cases:
+            user = users.get(case["user_id"])
+            doc = rebuild_case(dict(case))
+            doc["user_name"] = user["name"] if user else "Unknown"
+            doc["user_email"] = user["email"] if user else "Unknown"
+            docs.append(doc)
+        return JSONResponse(jsonable_encoder(docs)).body
+
+    benchmark(render)
+
+
+def test_admin_case_list_projected_orjson(benchmark, server, cases):
+    users = owners(cases)
+
+    def render():
+        docs = []
+        for case in cases:
+            case = dict(case)
+            user = users.get(case.pop("user_id"))
+            case["user_name"] = user["name"] if user else "Unknown"
+            case["user_email"] = user["email"] if user else "Unknown"
+            docs.append(server.normalize_case(case))
+        return ORJSONResponse({"items": docs, "next_cursor": None}).body
+
+    benchmark(render)